@@ -6,14 +6,13 @@ TAB = '%s <span class="number"><span>(</span>%s<span>)</span></span>'
 
 
 def assignments_count(tab, url_name, request):
-    from newsroom_core import models
+    from newsroom_core.utils.counts import get_user_counts
     from newsroom_core.utils.profile import get_profile
     user = request.user
     if not user or not user.is_authenticated() or\
        not get_profile(request.user).my_assignments_default:
         return tab, None
-    count = models.Assignment.objects.assignments().filter(
-                    involved=user, status__means_completed=False).count()
+    count = get_user_counts(user, request)['assignments']
     if not count:
         return tab, None
     tab = mark_safe(TAB % (escape(tab), count))
@@ -21,13 +20,11 @@ def assignments_count(tab, url_name, request):
 
 
 def requests_count(tab, url_name, request):
-    from newsroom_core import models
-    from newsroom_core.utils.profile import get_profile
+    from newsroom_core.utils.counts import get_user_counts
     user = request.user
     if not user or not user.is_authenticated():
         return tab, None
-    count = models.Assignment.objects.requests().filter(involved=user)\
-                                                .count()
+    count = get_user_counts(user, request)['requests']
     if not count:
         return tab, None
     tab = mark_safe(TAB % (escape(tab), count))
@@ -41,5 +38,5 @@ newsroom_tabs = (
 
 newsroom_secondary_tabs = (
     ('People', 'newsroom-people'),
-    #('Search', 'newsroom-search'),
+    ('Search', 'newsroom-search'),
 )
\ No newline at end of file
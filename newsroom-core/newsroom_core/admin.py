@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect
 from newsroom_core import models
+from newsroom_core.utils import schema
 
 
 class CategoryChoicesInline(admin.TabularInline):
@@ -61,16 +62,23 @@ class Category(SlugFromTitle):
     inlines = [CategoryFields]
 
     def response_change(self, request, obj, *args, **kwargs):
+        # Reorder fresh copies of the fields rather than the shared instances
+        # from the schema cache.
+        schema.invalidate()
         self.reorder_fields(category=obj)
+        # Only invalidate once the new order is committed, otherwise another
+        # process could cache the old order again in the meantime.
+        schema.invalidate()
         return super(Category, self).response_change(request, obj, *args,
                                                      **kwargs)
 
     @transaction.commit_on_success
     def reorder_fields(self, category):
-        for i, obj in enumerate(category.properties):
+        properties, details = category.properties, category.details
+        for i, obj in enumerate(properties):
             obj.order = i * 2 + 1
             obj.save()
-        for i, obj in enumerate(category.details):
+        for i, obj in enumerate(details):
             obj.order = i * 2 + 1
             obj.save()
 
@@ -85,6 +93,10 @@ class BaseItem(admin.ModelAdmin):
 class Assignment(BaseItem):
     pass
 
+
+class QueuedMail(admin.ModelAdmin):
+    list_display = ['to', 'subject', 'created_at', 'next_attempt', 'attempts']
+
 admin.site.register(models.Status, SlugFromTitle)
 admin.site.register(models.Section, SlugFromTitle)
 admin.site.register(models.Category, Category)
@@ -92,3 +104,4 @@ admin.site.register(models.CategoryChoiceField, CategoryChoiceField)
 admin.site.register(models.CategoryTextField, CategoryBaseField)
 admin.site.register(models.CategoryBigTextField, CategoryBaseField)
 admin.site.register(models.Assignment, Assignment)
+admin.site.register(models.QueuedMail, QueuedMail)
@@ -0,0 +1,97 @@
+"""
+A feed of the changes made to assignments, comments and status history, so
+that other tools can stay in sync without re-downloading everything.
+
+Every save and delete of a registered model is logged as a ``Change``. The id
+of the last change read is the cursor: asking for the changes since a cursor
+is a single range query on the primary key of the log. Deletes are logged
+too, so the log also serves as the tombstone table for deleted objects.
+
+Each change is returned as a dictionary with the current state of the object
+(or ``None`` if it has since been deleted), ready to be written out as a line
+of JSON.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import signals
+
+_registry = {}
+
+
+def register(model, serializer):
+    """
+    Log the saves and deletes of a model.
+
+    ``serializer`` is a function which is given a queryset of the model's
+    objects and returns a list of dictionaries (each with an ``id``).
+    """
+    _registry[model._meta.module_name] = (model, serializer)
+    uid = 'newsroom-changes-%s' % model._meta.module_name
+    signals.post_save.connect(_object_saved, sender=model, dispatch_uid=uid)
+    signals.post_delete.connect(_object_deleted, sender=model,
+                                dispatch_uid=uid)
+
+
+def log_change(obj, action):
+    from newsroom_core import models
+    models.Change.objects.create(
+        content_type=ContentType.objects.get_for_model(obj),
+        object_id=obj.pk, action=action)
+
+
+def get_latest_change():
+    """
+    Returns a tuple of the id and date of the latest change, or
+    ``(0, None)`` if nothing has changed yet.
+    """
+    from newsroom_core import models
+    latest = models.Change.objects.order_by('-pk').values_list('pk', 'date')
+    latest = list(latest[:1])
+    return latest and latest[0] or (0, None)
+
+
+def get_changes(since=None, limit=500):
+    """
+    Returns a tuple of the list of changes since the ``since`` cursor (up to
+    ``limit`` of them), the cursor to ask for the next changes with and
+    whether there are more changes waiting.
+    """
+    from newsroom_core import models
+    log = models.Change.objects.select_related('content_type')
+    if since:
+        log = log.filter(pk__gt=since)
+    log = list(log.order_by('pk')[:limit + 1])
+    more = len(log) > limit
+    log = log[:limit]
+
+    ids = {}
+    for change in log:
+        ids.setdefault(change.content_type.model, set()).add(change.object_id)
+    objects = {}
+    for name, pks in ids.items():
+        if name in _registry:
+            model, serializer = _registry[name]
+            queryset = model._default_manager.filter(pk__in=list(pks))
+            objects[name] = dict([(item['id'], item)
+                                  for item in serializer(queryset)])
+
+    data = []
+    for change in log:
+        name = change.content_type.model
+        data.append({
+            'id': change.pk,
+            'type': name,
+            'object_id': change.object_id,
+            'action': change.action,
+            'date': change.date,
+            'object': objects.get(name, {}).get(change.object_id),
+        })
+    cursor = log and log[-1].pk or since or 0
+    return data, cursor, more
+
+
+def _object_saved(sender, instance, created, **kwargs):
+    log_change(instance, created and 'create' or 'update')
+
+
+def _object_deleted(sender, instance, **kwargs):
+    log_change(instance, 'delete')
@@ -3,27 +3,44 @@ from django.core.urlresolvers import reverse, NoReverseMatch
 from django.template.defaultfilters import slugify
 from newsroom_core import apps
 
+_tab_urls = {}
+
+
+def _reverse_tab(url_name):
+    """
+    Returns the url of a tab, or ``None`` if it can't be reversed.
+
+    The urls don't change once the url configuration is loaded, so each is
+    only reversed once. Failures aren't remembered, as the urls can't be
+    reversed while the url configuration which builds the tabs is still being
+    loaded.
+    """
+    url = _tab_urls.get(url_name)
+    if url is None:
+        try:
+            url = reverse(url_name)
+        except NoReverseMatch:
+            return None
+        _tab_urls[url_name] = url
+    return url
+
 
 def _build_tabs(tabs_list, request):
     tabs = []
     for bits in tabs_list:
-        reverse_url = True
         try:
             tab, url_name, callback = bits
         except ValueError:
             tab, url_name = bits
-            slug = slugify(tab)
-        else:
-            slug = slugify(tab)
+            callback = None
+        slug = slugify(tab)
+        url = None
+        if callback:
             tab, url = callback(tab, url_name, request)
-            if url:
-                reverse_url = False
         if tab:
-            if reverse_url:
-                try:
-                    url = reverse(url_name)
-                except NoReverseMatch:
-                    continue
+            url = url or _reverse_tab(url_name)
+            if not url:
+                continue
             tabs.append((slug, tab, url))
     return tabs
 
@@ -34,4 +51,4 @@ def newsroom(request):
         'newsroom_tabs': _build_tabs(apps.tabs, request),
         'newsroom_secondary_tabs': _build_tabs(apps.secondary_tabs, request),
         'NEWSROOM_MEDIA_URL': settings.NEWSROOM_MEDIA_URL,
-    }
\ No newline at end of file
+    }
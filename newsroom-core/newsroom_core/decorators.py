@@ -1,7 +1,15 @@
+import datetime
+import time
 from django.core.urlresolvers import reverse
 from django.contrib.auth import REDIRECT_FIELD_NAME
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseNotModified, HttpResponseRedirect
+from django.utils.cache import patch_cache_control
 from django.utils.functional import wraps
+from django.utils.hashcompat import md5_constructor
+from django.utils.http import http_date, parse_etags, quote_etag
+from newsroom_core.changes import get_latest_change
+from newsroom_core.utils import rows
+from newsroom_core.utils.counts import get_user_counts
 from newsroom_core.utils.profile import get_profile
 
 
@@ -33,3 +41,54 @@ def editor_required(func):
         tup = reverse('newsroom-login'), REDIRECT_FIELD_NAME, request.path
         return HttpResponseRedirect('%s?%s=%s' % tup)
     return dec
+
+
+def conditional_page(func):
+    """
+    Decorator for views showing assignments, which answers conditional GET
+    requests with a "304 Not Modified" response (without running the view)
+    when nothing on the page could have changed.
+
+    The change log records every save and delete of assignments, comments and
+    status changes (including their field values and the people involved),
+    so its latest entry dates the page. Edits to statuses, sections,
+    categories and people aren't logged, so the generation of the cached
+    listing rows (which moves on with them, see ``newsroom_core.utils.rows``)
+    is part of the ETag too. The ETag also covers what differs between users
+    and requests: the user and their tab counts, the URL, the remembered sort
+    order and today's date. Only a matching
+    ETag is answered with a 304, as the date alone can't tell those apart;
+    ``Last-Modified`` is sent for information.
+    """
+    @wraps(func)
+    def dec(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return func(request, *args, **kwargs)
+        change_id, change_date = get_latest_change()
+        counts = get_user_counts(request.user, request)
+        bits = [change_id, rows.get_generation(), request.user.pk,
+                request.get_full_path(), datetime.date.today(),
+                sorted(counts.items())]
+        for key in ('newsroom-sort1', 'newsroom-sort1-reverse',
+                    'newsroom-sort2', 'newsroom-sort2-reverse'):
+            bits.append(request.session.get(key))
+        etag = md5_constructor(repr(bits)).hexdigest()
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = quote_etag(etag)
+        if change_date:
+            response['Last-Modified'] = http_date(
+                time.mktime(change_date.timetuple()))
+        # The pages differ per user, so only the browser may keep a copy and
+        # it should always check it is still current.
+        patch_cache_control(response, private=True, must_revalidate=True,
+                            max_age=0)
+        return response
+    return dec
+
@@ -1,3 +1,6 @@
 SEQUENCE = [
     'field_sortable',
+    'profile_email_digest',
+    'assignment_activity',
+    'composite_indexes',
 ]
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django_evolution.mutations import *
+from django.db import models
+
+MUTATIONS = [
+    AddField('Assignment', 'comment_count', models.PositiveIntegerField, initial=0),
+    AddField('Assignment', 'child_request_count', models.PositiveIntegerField, initial=0),
+    AddField('Assignment', 'child_assignment_count', models.PositiveIntegerField, initial=0),
+    AddField('Assignment', 'last_activity_at', models.DateTimeField, null=True),
+]
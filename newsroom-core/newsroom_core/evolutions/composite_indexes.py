@@ -0,0 +1,31 @@
+from django_evolution.mutations import *
+from django.db import models
+
+# Indexes for the common assignment, status history and comment lookups. The
+# same indexes are created for new databases by the SQL files in sql/.
+INDEXES = [
+    'CREATE INDEX newsroom_core_assignment_confirmed_pub_date '
+    'ON newsroom_core_assignment (confirmed, pub_date)',
+    'CREATE INDEX newsroom_core_assignment_confirmed_section_pub_date '
+    'ON newsroom_core_assignment (confirmed, section_id, pub_date)',
+    'CREATE INDEX newsroom_core_assignment_parent_confirmed '
+    'ON newsroom_core_assignment (parent_id, confirmed)',
+    'CREATE INDEX newsroom_core_assignment_confirmed_updated_on '
+    'ON newsroom_core_assignment (confirmed, updated_on)',
+    'CREATE INDEX newsroom_core_assignment_confirmed_last_activity_at '
+    'ON newsroom_core_assignment (confirmed, last_activity_at)',
+    'CREATE INDEX newsroom_core_statushistory_assignment_date '
+    'ON newsroom_core_statushistory (assignment_id, date DESC)',
+    'CREATE INDEX newsroom_core_assignmentcomment_assignment_created_at '
+    'ON newsroom_core_assignmentcomment (assignment_id, created_at)',
+]
+
+
+def unchanged_signature(app_label, project_sig):
+    # Indexes aren't part of the model signature.
+    pass
+
+
+MUTATIONS = [
+    SQLMutation('composite_indexes', INDEXES, unchanged_signature),
+]
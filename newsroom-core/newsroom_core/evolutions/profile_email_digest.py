@@ -0,0 +1,6 @@
+from django_evolution.mutations import *
+from django.db import models
+
+MUTATIONS = [
+    AddField('NewsroomProfile', 'email_digest', models.BooleanField, initial=False)
+]
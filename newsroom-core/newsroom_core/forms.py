@@ -2,42 +2,16 @@ from django import forms
 from django.db.models import Model
 from django.db.models.fields import FieldDoesNotExist
 from newsroom_core import models
+from newsroom_core.utils import people
 
 
 def people_choices(user_id=None):
-    section = None
-    choices = []
     if user_id and isinstance(user_id, (list, tuple)):
         user_id = user_id[0]
-    user_profile = None
-    choice_group = []
-    profiles = models.NewsroomProfile.objects.select_related().order_by(
-        'section__title', 'user__first_name', 'user__last_name'
-    )
-    for profile in profiles:
-        if profile.section != section:
-            section = profile.section
-            if choice_group and choice_group[1]:
-                choices.append(choice_group)
-            choice_group = [section, []]
-        if user_id and user_id == profile.user_id:
-            user_profile = profile
-        else:
-            choice_group[1].append((profile.user_id, unicode(profile)))
-    if choice_group and choice_group[1]:
-        choices.append(choice_group)
-    # Shift the user's section to the top and insert the user
-    if user_profile:
-        found = False
-        for i in range(len(choices)):
-            if choices[i][0] == user_profile.section:
-                choices.insert(0, choices.pop(i))
-                found = True
-                break
-        if not found:
-            choices.insert(0, [user_profile.section, []])
-        choices[0][1].insert(0, (user_profile.user_id, unicode(user_profile)))
-    return choices
+    return people.get_people_choices(user_id)
+
+
+_value_models = {}
 
 
 def get_value_model(category_model):
@@ -45,13 +19,19 @@ def get_value_model(category_model):
     Returns the matching generic field value model for the given category
     model/instance.
     """
-    value_field = None
-    for rel in category_model._meta.get_all_related_objects():
-        try:
-            rel.model._meta.get_field('assignment')
-            return rel.model
-        except FieldDoesNotExist:
-            pass
+    if not isinstance(category_model, type):
+        category_model = category_model.__class__
+    if category_model not in _value_models:
+        value_model = None
+        for rel in category_model._meta.get_all_related_objects():
+            try:
+                rel.model._meta.get_field('assignment')
+            except FieldDoesNotExist:
+                continue
+            value_model = rel.model
+            break
+        _value_models[category_model] = value_model
+    return _value_models[category_model]
 
 
 def dynamic_form_field(db_field):
@@ -211,7 +191,11 @@ class AssignmentPropertiesForm(forms.Form):
     class Meta:
         model = models.Assignment
 
-    def save(self, commit=True):
+    def save(self, commit=True, reindex=True):
+        """
+        Save the values of the fields. Pass ``reindex=False`` when the
+        assignment is re-indexed afterwards anyway (i.e. it is saved next).
+        """
         if not self.instance:
             raise KeyError('Cannot save unless an instance is provided.')
         for field in self.dynamic_fields():
@@ -228,6 +212,10 @@ class AssignmentPropertiesForm(forms.Form):
             else:
                 model.objects.filter(assignment=self.instance, field=field)\
                                 .delete()
+        if reindex:
+            self.instance.values_changed()
+        else:
+            self.instance.clear_values_cache()
     save.alters_data = True
 
 
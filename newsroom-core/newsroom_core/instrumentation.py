@@ -0,0 +1,291 @@
+"""
+Opt-in instrumentation of the newsroom views, to find the expensive pages in
+production without attaching a profiler.
+
+To use it, set ``NEWSROOM_INSTRUMENTATION = True`` and add
+``'newsroom_core.instrumentation.InstrumentationMiddleware'`` to the
+``MIDDLEWARE_CLASSES`` setting. For every request, the middleware records
+(per view name) the number of SQL queries, the time spent in the database,
+the time spent rendering templates and the time spent in the expensive
+template tags.
+
+The measurements are:
+
+* sent as ``X-Newsroom-*`` response headers when ``DEBUG`` is on,
+* kept in the cache (the last ``NEWSROOM_INSTRUMENTATION_SAMPLES`` requests
+  of each view, one key per request) and summarized as percentiles on the
+  editors' stats page,
+* logged as a warning for requests slower than
+  ``NEWSROOM_SLOW_REQUEST_TIME`` seconds (one second by default).
+"""
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.urlresolvers import resolve, Resolver404
+
+VIEWS_KEY = 'newsroom-stats-views'
+TIMINGS = ('total_time', 'db_time', 'template_time', 'tag_time')
+
+logger = logging.getLogger('newsroom.instrumentation')
+_local = threading.local()
+_installed = []
+
+
+def enabled():
+    return getattr(settings, 'NEWSROOM_INSTRUMENTATION', False)
+
+
+class Stats(object):
+    """
+    The measurements for a single request.
+    """
+    def __init__(self, view_name):
+        self.view_name = view_name
+        self.start = time.time()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.tags = {}
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'total_time': time.time() - self.start,
+            'db_time': self.db_time,
+            'template_time': self.template_time,
+            'tag_time': sum(self.tags.values()),
+            'tags': self.tags,
+        }
+
+
+def _current():
+    return getattr(_local, 'stats', None)
+
+
+class TimingCursor(object):
+    """
+    Wraps a database cursor, counting and timing the queries it executes.
+    """
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def _time(self, method, *args):
+        start = time.time()
+        try:
+            return method(*args)
+        finally:
+            self.stats.queries += 1
+            self.stats.db_time += time.time() - start
+
+    def execute(self, sql, params=()):
+        return self._time(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._time(self.cursor.executemany, sql, param_list)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+def _install():
+    """
+    Hook into database cursors and template rendering. This only needs to
+    happen once per process; nothing is recorded outside of an instrumented
+    request.
+    """
+    if _installed:
+        return
+    from django.db.backends import BaseDatabaseWrapper
+    from django.template import Template
+
+    original_cursor = BaseDatabaseWrapper.cursor
+
+    def cursor(self, *args, **kwargs):
+        cursor = original_cursor(self, *args, **kwargs)
+        stats = _current()
+        if stats is not None:
+            cursor = TimingCursor(cursor, stats)
+        return cursor
+    BaseDatabaseWrapper.cursor = cursor
+
+    original_render = Template.render
+
+    def render(self, context):
+        stats = _current()
+        if stats is None:
+            return original_render(self, context)
+        # Included and extended templates are rendered inside the outermost
+        # template, so only time that one.
+        stats.template_depth += 1
+        start = time.time()
+        try:
+            return original_render(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += time.time() - start
+    Template.render = render
+
+    _installed.append(True)
+
+
+def timed_tag(name):
+    """
+    Decorator for the rendering functions of template tags, recording the
+    time spent in them for instrumented requests.
+    """
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            stats = _current()
+            if stats is None:
+                return func(*args, **kwargs)
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.tags[name] = stats.tags.get(name, 0.0) + \
+                                   time.time() - start
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+
+def _view_name(request, view_func):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        match = None
+    url_name = getattr(match, 'url_name', None)
+    if url_name:
+        return url_name
+    return '%s.%s' % (view_func.__module__, view_func.__name__)
+
+
+class InstrumentationMiddleware(object):
+    def __init__(self):
+        if not enabled():
+            raise MiddlewareNotUsed
+        _install()
+
+    def process_request(self, request):
+        _local.stats = None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.stats = Stats(_view_name(request, view_func))
+
+    def process_response(self, request, response):
+        stats = _current()
+        if stats is None:
+            return response
+        _local.stats = None
+        data = stats.as_dict()
+        if settings.DEBUG:
+            response['X-Newsroom-View'] = stats.view_name
+            response['X-Newsroom-Queries'] = str(data['queries'])
+            for name in TIMINGS:
+                header = 'X-Newsroom-%s' % name.replace('_', '-').title()
+                response[header] = '%.4f' % data[name]
+            if data['tags']:
+                response['X-Newsroom-Tags'] = ', '.join([
+                    '%s=%.4f' % (name, seconds) for name, seconds
+                    in sorted(data['tags'].items())])
+        slow = getattr(settings, 'NEWSROOM_SLOW_REQUEST_TIME', 1.0)
+        if data['total_time'] >= slow:
+            logger.warning(
+                'Slow request: %s %s (%s) took %.3fs, %s queries in %.3fs, '
+                'templates %.3fs, tags %.3fs' % (
+                    request.method, request.get_full_path(), stats.view_name,
+                    data['total_time'], data['queries'], data['db_time'],
+                    data['template_time'], data['tag_time']))
+        record(stats.view_name, data)
+        return response
+
+
+def _key(view_name):
+    return 'newsroom-stats-%s' % view_name
+
+
+def _sample_key(view_name, number):
+    return 'newsroom-stats-%s-%s' % (view_name, number)
+
+
+def _sample_numbers(count):
+    samples = getattr(settings, 'NEWSROOM_INSTRUMENTATION_SAMPLES', 200)
+    return [number % samples
+            for number in range(max(1, count - samples + 1), count + 1)]
+
+
+def record(view_name, data):
+    """
+    Add the measurements of a request to the samples kept for its view.
+
+    Each sample is kept under its own key, numbered by a counter of the
+    view's requests which wraps around, so concurrent requests don't
+    overwrite each other's samples and only one sample is written per
+    request.
+    """
+    timeout = 60 * 60 * 24 * 7
+    key = _key(view_name)
+    cache.add(key, 0, timeout)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # The counter was evicted since it was added.
+        count = 1
+        cache.set(key, count, timeout)
+    cache.set(_sample_key(view_name, _sample_numbers(count)[-1]), data,
+              timeout)
+    views = cache.get(VIEWS_KEY) or []
+    if view_name not in views:
+        views.append(view_name)
+        cache.set(VIEWS_KEY, views, timeout)
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at the given fraction (i.e. ``0.9``) of a sorted list of
+    values, using the nearest rank.
+    """
+    if not values:
+        return None
+    index = int(math.ceil(fraction * len(values))) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def get_summary():
+    """
+    Returns a list of dictionaries summarizing the samples for each view,
+    slowest (by 90th percentile) first.
+    """
+    views = cache.get(VIEWS_KEY) or []
+    counts = cache.get_many([_key(view_name) for view_name in views])
+    keys = {}
+    for view_name in views:
+        keys[view_name] = [
+            _sample_key(view_name, number)
+            for number in _sample_numbers(counts.get(_key(view_name), 0))]
+    samples = cache.get_many(sum(keys.values(), []))
+    summary = []
+    for view_name in views:
+        entries = [samples[key] for key in keys[view_name] if key in samples]
+        if not entries:
+            continue
+        row = {'view': view_name, 'count': len(entries)}
+        for name in ('queries',) + TIMINGS:
+            values = sorted([entry[name] for entry in entries])
+            for label, fraction in (('p50', 0.5), ('p90', 0.9),
+                                    ('p99', 0.99)):
+                row['%s_%s' % (name, label)] = percentile(values, fraction)
+        summary.append(row)
+    summary.sort(key=lambda row: row['total_time_p90'], reverse=True)
+    return summary
@@ -0,0 +1,124 @@
+import datetime
+import sys
+from optparse import make_option
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError, NoArgsCommand
+from django.core.urlresolvers import reverse
+from django.db.models import Count
+from django.template import Context, Template
+from django.test.client import Client
+from django.utils import simplejson
+from newsroom_core import models
+from newsroom_core.utils.benchmark import measure, median, reset_caches
+
+
+class Command(NoArgsCommand):
+    help = ('Time the main newsroom views and template tags against the '
+            'current database, writing the results as JSON. Generate a '
+            'dataset with newsroom_generate_data first.')
+    option_list = NoArgsCommand.option_list + (
+        make_option('--repeat', dest='repeat', type='int', default=5,
+                    help='Number of times to run each benchmark.'),
+        make_option('--username', dest='username', default='benchmark'),
+        make_option('--password', dest='password', default='benchmark'),
+        make_option('--warm', action='store_true', dest='warm',
+                    default=False,
+                    help="Don't clear the newsroom caches before each run."),
+        make_option('--label', dest='label', default='',
+                    help='A label to include in the results (i.e. a commit '
+                         'id).'),
+        make_option('--output', dest='output',
+                    help='Write the results to a file rather than stdout.'),
+    )
+
+    def handle_noargs(self, repeat=5, username='benchmark',
+                      password='benchmark', warm=False, label='', output=None,
+                      **options):
+        client = Client()
+        if not client.login(username=username, password=password):
+            raise CommandError('Could not log in as "%s".' % username)
+        user = User.objects.get(username=username)
+
+        # Use the busiest day for the day views.
+        busiest = models.Assignment.objects.assignments()\
+                        .exclude(pub_date=None).values('pub_date')\
+                        .annotate(count=Count('id')).order_by('-count')[:1]
+        if not busiest:
+            raise CommandError('There are no assignments to benchmark.')
+        day = busiest[0]['pub_date']
+        day_args = [day.year, '%02d' % day.month, '%02d' % day.day]
+
+        def view(name, *args):
+            url = reverse(name, args=args)
+            def run():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError('%s returned a %s response.'
+                                       % (url, response.status_code))
+            return run
+
+        def tag(source, **context):
+            t = Template(source)
+            context['user'] = user
+            return lambda: t.render(Context(context))
+
+        assignments = models.Assignment.objects.assignments()
+        benchmarks = [
+            ('listing', view('newsroom-assignments')),
+            ('listing_day', view('newsroom-assignments-day', *day_args)),
+            ('compiled', view('newsroom-assignments-day-compiled',
+                              *day_args)),
+            ('assignments_involved', view('newsroom-assignments-profile',
+                                          username)),
+            ('people.listing', view('newsroom-people')),
+            ('newsroom_calendar', tag('{% load newsroom_calendar %}'
+                                      '{% newsroom_calendar 30 %}')),
+            ('get_statuses', tag('{% load newsroom_assignments %}'
+                                 '{% get_statuses as statuses for day from '
+                                 'assignments %}',
+                                 day=day, assignments=assignments)),
+        ]
+
+        results = []
+        for name, func in benchmarks:
+            times = []
+            query_counts = []
+            for i in range(repeat):
+                if not warm:
+                    reset_caches()
+                result, elapsed, queries = measure(func)
+                times.append(elapsed)
+                query_counts.append(len(queries))
+            results.append({
+                'name': name,
+                'times': times,
+                'min': min(times),
+                'median': median(times),
+                'max': max(times),
+                'queries': max(query_counts),
+            })
+            if int(options.get('verbosity', 1)) > 1:
+                sys.stderr.write('%s: %.3fs, %s queries\n'
+                                 % (name, median(times), max(query_counts)))
+
+        data = {
+            'label': label,
+            'date': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+            'warm': warm,
+            'day': day.isoformat(),
+            'counts': {
+                'assignments': models.Assignment.objects.count(),
+                'comments': models.AssignmentComment.objects.count(),
+                'users': models.NewsroomProfile.objects.count(),
+            },
+            'results': results,
+        }
+        if output:
+            f = open(output, 'w')
+        else:
+            f = sys.stdout
+        f.write(simplejson.dumps(data, indent=2))
+        f.write('\n')
+        if output:
+            f.close()
@@ -0,0 +1,27 @@
+import sys
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from newsroom_core import changes
+from newsroom_core.utils.serialize import dumps
+
+
+class Command(NoArgsCommand):
+    help = ('Write the changes to assignments, comments and status history '
+            'since a cursor as newline-delimited JSON. The last line holds '
+            'the cursor to use next time.')
+    option_list = NoArgsCommand.option_list + (
+        make_option('--since', dest='since', type='int', default=0,
+                    help='The cursor from the last run (all changes are '
+                         'written if not given).'),
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=500,
+                    help='Number of changes to read at a time.'),
+    )
+
+    def handle_noargs(self, since=0, batch_size=500, **options):
+        more = True
+        while more:
+            data, since, more = changes.get_changes(since, batch_size)
+            for change in data:
+                sys.stdout.write(dumps(change).encode('utf-8') + '\n')
+        sys.stdout.write(dumps({'cursor': since}) + '\n')
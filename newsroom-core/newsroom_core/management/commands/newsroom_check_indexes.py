@@ -0,0 +1,152 @@
+import datetime
+import re
+import sys
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import CommandError, NoArgsCommand
+from django.db import connection
+from django.db.models import Count
+from newsroom_core import models
+
+
+class Command(NoArgsCommand):
+    help = ("EXPLAIN the main query of each newsroom view and report the "
+            "sequential scans of the large tables (assignments, involved "
+            "people, status history, comments, files and ideas). Run it "
+            "against a realistic database, i.e. one filled by "
+            "newsroom_generate_data, as databases scan small tables anyway. "
+            "Some database backends (i.e. SQLite) commit any open transaction "
+            "before running EXPLAIN or ANALYZE.")
+    option_list = NoArgsCommand.option_list + (
+        make_option('--analyze', action='store_true', dest='analyze',
+                    default=False,
+                    help='Update the table statistics first.'),
+        make_option('--fail', action='store_true', dest='fail',
+                    default=False,
+                    help='Exit with an error if there are sequential scans.'),
+    )
+
+    def handle_noargs(self, analyze=False, fail=False, **options):
+        verbosity = int(options.get('verbosity', 1))
+        engine = connection.settings_dict['ENGINE'].split('.')[-1]
+        if engine == 'sqlite3':
+            explain, find_scans = 'EXPLAIN QUERY PLAN ', self.sqlite_scans
+        elif engine.startswith('postgresql'):
+            explain, find_scans = 'EXPLAIN ', self.postgresql_scans
+        elif engine == 'mysql':
+            explain, find_scans = 'EXPLAIN ', self.mysql_scans
+        else:
+            raise CommandError('Explaining queries is not supported for the '
+                               '%s database backend.' % engine)
+        cursor = connection.cursor()
+        if analyze and engine != 'mysql':
+            cursor.execute('ANALYZE')
+
+        tables = self.get_large_tables()
+        scans = 0
+        for name, queryset in self.get_queries():
+            sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+            cursor.execute(explain + sql, params)
+            rows = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
+            scanned = [table for table in find_scans(rows, columns)
+                       if table in tables]
+            scans += len(scanned)
+            if verbosity > 1 or (scanned and verbosity):
+                sys.stdout.write('%s: %s\n' % (
+                    name, scanned and 'sequential scan of %s'
+                    % ', '.join(scanned) or 'ok'))
+            if verbosity > 1:
+                for row in rows:
+                    sys.stdout.write('    %s\n' % ' | '.join(
+                        [unicode(value) for value in row]))
+        if verbosity:
+            sys.stdout.write('%s sequential scan%s found.\n' % (
+                scans, scans != 1 and 's' or ''))
+        if scans and fail:
+            raise CommandError('Some queries scan whole tables.')
+
+    def get_large_tables(self):
+        large = [models.Assignment, models.Assignment.involved.through,
+                 models.StatusHistory, models.AssignmentComment]
+        if 'newsroom_files' in settings.INSTALLED_APPS:
+            from newsroom_files.models import File
+            large.append(File)
+        if 'newsroom_ideas' in settings.INSTALLED_APPS:
+            from newsroom_ideas.models import Idea
+            large.append(Idea)
+        return set([model._meta.db_table for model in large])
+
+    def get_queries(self):
+        """
+        Returns a list of tuples of a name and the main queryset of each view,
+        using the busiest day, section and assignment of the data.
+        """
+        busiest = models.Assignment.objects.assignments()\
+                        .exclude(pub_date=None).values('pub_date', 'section')\
+                        .annotate(count=Count('id')).order_by('-count')[:1]
+        if not busiest:
+            raise CommandError('There are no assignments to explain queries '
+                               'for.')
+        day, section = busiest[0]['pub_date'], busiest[0]['section']
+        assignment = models.Assignment.objects.assignments()\
+                        .filter(parent__isnull=True)\
+                        .annotate(count=Count('children'))\
+                        .order_by('-count').values('pk', 'count')[0]['pk']
+        week = day + datetime.timedelta(days=7)
+        manager = models.Assignment.objects
+        queries = [
+            ('assignments.listing (upcoming)',
+             manager.listing_assignments().filter(pub_date__gte=day,
+                                                  pub_date__lte=week)
+                    .order_by('pub_date', '-created_at')),
+            ('assignments.listing_day',
+             manager.listing_assignments().filter(pub_date=day)),
+            ('assignments.listing_day (section)',
+             manager.listing_assignments().filter(pub_date=day,
+                                                  section=section)),
+            ('assignments.assignment_detail (requests)',
+             manager.requests().filter(parent=assignment)),
+            ('assignments.assignment_detail (status history)',
+             models.StatusHistory.objects.filter(assignment=assignment)),
+            ('assignments.assignment_detail (comments)',
+             models.AssignmentComment.objects.filter(assignment=assignment)),
+            ('requests.listing (recent activity)',
+             manager.listing_requests()
+                    .order_by('-last_activity_at', '-pk')[:50]),
+            ('api.assignments (updated since)',
+             manager.assignments().filter(
+                 updated_on__gte=datetime.datetime.now() -
+                                 datetime.timedelta(days=1))),
+        ]
+        if 'newsroom_files' in settings.INSTALLED_APPS:
+            from newsroom_files.models import File
+            queries.append(('files.listing (section)',
+                            File.objects.filter(section=section)[:10]))
+        if 'newsroom_ideas' in settings.INSTALLED_APPS:
+            from newsroom_ideas.models import Idea
+            queries.append(('ideas.listing (section)',
+                            Idea.objects.filter(section=section)[:10]))
+        return queries
+
+    def sqlite_scans(self, rows, columns):
+        # The plan details look like "SCAN TABLE x" (or "SCAN x") for full
+        # table scans and "SEARCH TABLE x USING INDEX ..." otherwise.
+        scans = []
+        for row in rows:
+            match = re.match(r'SCAN (?:TABLE )?(\w+)', row[-1])
+            if match and 'USING' not in row[-1]:
+                scans.append(match.group(1))
+        return scans
+
+    def postgresql_scans(self, rows, columns):
+        return re.findall(r'Seq Scan on (\w+)',
+                          '\n'.join([row[0] for row in rows]))
+
+    def mysql_scans(self, rows, columns):
+        scans = []
+        for row in rows:
+            row = dict(zip(columns, row))
+            if row.get('type') == 'ALL':
+                scans.append(row['table'])
+        return scans
@@ -0,0 +1,270 @@
+import datetime
+import random
+import sys
+from optparse import make_option
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import NoArgsCommand
+from newsroom_core import models
+
+WORDS = (
+    'budget council election campus police game season recap preview review '
+    'concert protest tuition housing research library student faculty regents '
+    'fees transit stadium coach record debate senate health dining festival '
+    'exhibit lecture graduation admissions strike union parking science art '
+    'theater film music album interview profile feature investigation report '
+    'photo video opinion column editorial letter survey data map graphic'
+).split()
+FIRST_NAMES = ('Alex Jordan Sam Casey Riley Morgan Taylor Jamie Avery Quinn '
+               'Drew Reese Rowan Skyler Emerson Hayden Parker Sage').split()
+LAST_NAMES = ('Smith Nguyen Garcia Kim Patel Lee Chen Lopez Brown Davis Park '
+              'Wong Rivera Khan Cohen Silva Ito Moreno').split()
+SECTIONS = ('News', 'Sports', 'Arts', 'Opinion', 'Photo', 'Video', 'Online',
+            'Features', 'Science', 'Copy', 'Design', 'Graphics')
+CATEGORIES = ('Story', 'Photo', 'Graphic', 'Video', 'Blog post', 'Column')
+STATUSES = (('Pitched', False), ('Assigned', False), ('In progress', False),
+            ('Filed', False), ('Edited', True), ('Published', True),
+            ('Killed', True))
+
+
+class Command(NoArgsCommand):
+    help = ('Fill the database with a realistic (random) newsroom for '
+            'performance testing. Only use this on a development database.')
+    option_list = NoArgsCommand.option_list + (
+        make_option('--years', dest='years', type='int', default=2,
+                    help='Years of assignments to create, ending a month '
+                         'from today.'),
+        make_option('--per-day', dest='per_day', type='int', default=6,
+                    help='Average number of assignments per day.'),
+        make_option('--sections', dest='sections', type='int', default=8),
+        make_option('--categories', dest='categories', type='int', default=4),
+        make_option('--fields', dest='fields', type='int', default=10,
+                    help='Number of fields for each category.'),
+        make_option('--people', dest='people', type='int', default=80),
+        make_option('--comments', dest='comments', type='int', default=3,
+                    help='Average number of comments per assignment.'),
+        make_option('--seed', dest='seed', type='int', default=0,
+                    help='Seed for the random numbers, so that datasets can '
+                         'be reproduced.'),
+        make_option('--no-files', action='store_false', dest='files',
+                    default=True,
+                    help="Don't create files (which are written to "
+                         "MEDIA_ROOT)."),
+    )
+
+    def handle_noargs(self, **options):
+        self.verbosity = int(options.get('verbosity', 1))
+        self.random = random.Random(options['seed'])
+        sections = self.create_sections(options['sections'])
+        statuses = self.create_statuses()
+        categories = self.create_categories(options['categories'],
+                                            options['fields'])
+        users = self.create_people(options['people'], sections)
+        self.create_assignments(options['years'], options['per_day'],
+                                options['comments'], sections, statuses,
+                                categories, users)
+        if 'newsroom_ideas' in settings.INSTALLED_APPS:
+            self.create_ideas(options['years'], sections, users)
+        if options['files'] and 'newsroom_files' in settings.INSTALLED_APPS:
+            self.create_files(sections, users)
+
+    def log(self, message):
+        if self.verbosity:
+            sys.stdout.write('%s\n' % message)
+
+    def words(self, low, high):
+        count = self.random.randint(low, high)
+        return ' '.join([self.random.choice(WORDS) for i in range(count)])
+
+    def create_sections(self, count):
+        sections = []
+        for i in range(count):
+            title = SECTIONS[i % len(SECTIONS)]
+            if i >= len(SECTIONS):
+                title = '%s %s' % (title, i // len(SECTIONS) + 1)
+            section, created = models.Section.objects.get_or_create(
+                slug=title.lower().replace(' ', '-'),
+                defaults={'title': title})
+            sections.append(section)
+        self.log('%s sections.' % len(sections))
+        return sections
+
+    def create_statuses(self):
+        statuses = []
+        for order, (title, completed) in enumerate(STATUSES):
+            status, created = models.Status.objects.get_or_create(
+                slug=title.lower().replace(' ', '-'),
+                defaults={'title': title, 'order': order + 1,
+                          'means_completed': completed})
+            statuses.append(status)
+        return statuses
+
+    def create_categories(self, count, field_count):
+        categories = []
+        for i in range(count):
+            title = CATEGORIES[i % len(CATEGORIES)]
+            if i >= len(CATEGORIES):
+                title = '%s %s' % (title, i // len(CATEGORIES) + 1)
+            category, created = models.Category.objects.get_or_create(
+                slug=title.lower().replace(' ', '-'),
+                defaults={'title': title, 'top_category': i % 2 == 0})
+            if created:
+                for j in range(field_count):
+                    self.create_field(category, j)
+            categories.append(category)
+        self.log('%s categories.' % len(categories))
+        return categories
+
+    def create_field(self, category, index):
+        kwargs = {
+            'category': category,
+            'name': '%s %s' % (self.random.choice(WORDS).capitalize(),
+                               index + 1),
+            'is_property': index % 4 != 3,
+            'required': index % 3 == 0,
+        }
+        if not kwargs['is_property']:
+            return models.CategoryBigTextField.objects.create(**kwargs)
+        if index % 3 == 1:
+            kwargs['sortable'] = 1
+            field = models.CategoryChoiceField.objects.create(**kwargs)
+            for i in range(self.random.randint(3, 8)):
+                field.choices.create(option=self.words(1, 2))
+            return field
+        kwargs['sortable'] = self.random.choice([0, 1, 2])
+        return models.CategoryTextField.objects.create(length=50, **kwargs)
+
+    def create_people(self, count, sections):
+        users = []
+        for i in range(count):
+            username = 'person%s' % (i + 1)
+            user, created = User.objects.get_or_create(username=username,
+                defaults={'first_name': self.random.choice(FIRST_NAMES),
+                          'last_name': self.random.choice(LAST_NAMES),
+                          'email': '%s@example.com' % username})
+            if created:
+                models.NewsroomProfile.objects.create(
+                    user=user, section=self.random.choice(sections),
+                    is_editor=i % 10 == 0, title=self.words(1, 2))
+            users.append(user)
+        # A known user to log in as when benchmarking.
+        user, created = User.objects.get_or_create(username='benchmark',
+            defaults={'first_name': 'Bench', 'last_name': 'Mark',
+                      'email': 'benchmark@example.com'})
+        if created:
+            user.set_password('benchmark')
+            user.save()
+            models.NewsroomProfile.objects.create(user=user,
+                                                  section=sections[0],
+                                                  is_editor=True)
+        users.append(user)
+        self.log('%s people.' % len(users))
+        return users
+
+    def create_assignments(self, years, per_day, comments, sections, statuses,
+                           categories, users):
+        top_categories = [c for c in categories if c.top_category]
+        sub_categories = [c for c in categories if not c.top_category]
+        today = datetime.date.today()
+        day = today - datetime.timedelta(days=365 * years - 30)
+        last_day = today + datetime.timedelta(days=30)
+        count = 0
+        while day <= last_day:
+            for i in range(self.random.randint(0, per_day * 2)):
+                parent = self.create_assignment(day, sections, statuses,
+                                                top_categories or categories,
+                                                users, comments)
+                count += 1
+                # Some assignments have child requests or assignments.
+                for j in range(self.random.choice([0, 0, 0, 1, 2])):
+                    self.create_assignment(day, sections, statuses,
+                                           sub_categories or categories,
+                                           users, comments, parent=parent)
+                    count += 1
+            day += datetime.timedelta(days=1)
+            if self.verbosity > 1 and day.day == 1:
+                self.log('Created assignments up to %s.' % day)
+        self.log('%s assignments and requests.' % count)
+
+    def create_assignment(self, day, sections, statuses, categories, users,
+                          comments, parent=None):
+        rand = self.random
+        created_by = rand.choice(users)
+        created_at = datetime.datetime.combine(
+            day - datetime.timedelta(days=rand.randint(1, 14)),
+            datetime.time(rand.randint(8, 22), rand.randint(0, 59)))
+        if day > datetime.date.today():
+            status = rand.choice(statuses[:4])
+        else:
+            status = rand.choice(statuses)
+        assignment = models.Assignment.objects.create(
+            title=self.words(2, 6).capitalize(),
+            status=status, section=rand.choice(sections),
+            category=rand.choice(categories), responsible=rand.choice(users),
+            created_by=created_by, created_at=created_at,
+            pub_date=rand.random() < 0.9 and day or None,
+            parent=parent, confirmed=rand.random() < 0.8,
+        )
+        assignment.involved.add(*rand.sample(users, rand.randint(1, 3)))
+        for field in assignment.category.properties + \
+                assignment.category.details:
+            if not field.required and rand.random() < 0.3:
+                continue
+            if isinstance(field, models.CategoryChoiceField):
+                choices = list(field.choices.all())
+                if choices:
+                    field.values.create(assignment=assignment,
+                                        value=rand.choice(choices))
+            elif isinstance(field, models.CategoryBigTextField):
+                field.values.create(assignment=assignment,
+                                    value=self.words(20, 200))
+            else:
+                field.values.create(assignment=assignment,
+                                    value=self.words(1, 4)[:field.length])
+        assignment.values_changed()
+        # Nobody is notified of the generated comments and status changes.
+        for i in range(rand.randint(0, comments * 2)):
+            models.AssignmentComment(
+                assignment=assignment, created_by=rand.choice(users),
+                created_at=created_at + datetime.timedelta(hours=i + 1),
+                comment=self.words(5, 60)).save(notify=False)
+        for i in range(rand.randint(0, 3)):
+            models.StatusHistory(
+                assignment=assignment, status=rand.choice(statuses),
+                user=rand.choice(users), comment=self.words(0, 10),
+                date=created_at + datetime.timedelta(hours=i * 5 + 1))\
+                  .save(notify=False)
+        return assignment
+
+    def create_ideas(self, years, sections, users):
+        from newsroom_ideas.models import Idea, Comment
+        count = 0
+        start = datetime.datetime.now() - datetime.timedelta(days=365 * years)
+        for i in range(years * 200):
+            created_at = start + datetime.timedelta(
+                days=self.random.randint(0, 365 * years))
+            idea = Idea.objects.create(
+                idea=self.words(5, 40), section=self.random.choice(sections),
+                created_by=self.random.choice(users), created_at=created_at)
+            for j in range(self.random.randint(0, 4)):
+                Comment.objects.create(
+                    idea=idea, comment=self.words(3, 30),
+                    created_by=self.random.choice(users),
+                    created_at=created_at + datetime.timedelta(hours=j + 1))
+            count += 1
+        self.log('%s ideas.' % count)
+
+    def create_files(self, sections, users):
+        from newsroom_files.models import File
+        count = 0
+        for section in sections:
+            for i in range(self.random.randint(5, 20)):
+                f = File(section=section, created_by=self.random.choice(users),
+                         description=self.words(0, 20))
+                name = '%s_%s.txt' % (self.random.choice(WORDS), i + 1)
+                f.file.save(name, ContentFile(self.words(50, 500)),
+                            save=False)
+                f.save()
+                count += 1
+        self.log('%s files.' % count)
@@ -0,0 +1,29 @@
+import sys
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from newsroom_core import models
+from newsroom_core import search
+
+
+class Command(NoArgsCommand):
+    help = 'Rebuild the newsroom search index from scratch.'
+    option_list = NoArgsCommand.option_list + (
+        make_option('--no-clear', action='store_false', dest='clear',
+                    default=True,
+                    help='Update the existing index rather than clearing it '
+                         'first.'),
+    )
+
+    def handle_noargs(self, clear=True, **options):
+        verbosity = int(options.get('verbosity', 1))
+        if clear:
+            models.SearchTerm.objects.all().delete()
+            models.SearchDocument.objects.all().delete()
+        for model in search.get_registered_models():
+            count = 0
+            for obj in search._registry[model].get_queryset().iterator():
+                search.index_object(obj)
+                count += 1
+            if verbosity:
+                sys.stdout.write('Indexed %s %s.\n' % (count,
+                                          model._meta.verbose_name_plural))
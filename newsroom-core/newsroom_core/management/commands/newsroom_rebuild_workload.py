@@ -0,0 +1,14 @@
+import sys
+from django.core.management.base import NoArgsCommand
+from newsroom_core.utils import workload
+
+
+class Command(NoArgsCommand):
+    help = ('Rebuild the summary of the assignments and requests everyone is '
+            'involved in from scratch.')
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        rows = workload.rebuild()
+        if verbosity:
+            sys.stdout.write('Rebuilt %s workload rows.\n' % rows)
@@ -0,0 +1,20 @@
+import sys
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from newsroom_core.utils import activity
+
+
+class Command(NoArgsCommand):
+    help = ('Recalculate the comment and child counts and the latest activity '
+            'of every assignment.')
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=500,
+                    help='Number of assignments to recalculate at a time.'),
+    )
+
+    def handle_noargs(self, batch_size=500, **options):
+        verbosity = int(options.get('verbosity', 1))
+        fixed = activity.recalculate(batch_size=batch_size)
+        if verbosity:
+            sys.stdout.write('Repaired %s assignments.\n' % fixed)
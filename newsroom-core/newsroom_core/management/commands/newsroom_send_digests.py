@@ -0,0 +1,16 @@
+import sys
+from django.core.management.base import NoArgsCommand
+from newsroom_core.utils.mail import send_digests
+
+
+class Command(NoArgsCommand):
+    help = ('Send a digest of assignment comments and status changes to the '
+            'users who prefer digest notifications. Run this at the digest '
+            'interval (e.g. hourly from cron).')
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        sent = send_digests()
+        if verbosity and sent:
+            sys.stdout.write('Sent %s digest%s.\n' % (sent,
+                                                      sent != 1 and 's' or ''))
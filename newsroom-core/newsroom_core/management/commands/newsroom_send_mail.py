@@ -0,0 +1,22 @@
+import sys
+from optparse import make_option
+from django.core.management.base import NoArgsCommand
+from newsroom_core.utils.mail import send_queued_mail
+
+
+class Command(NoArgsCommand):
+    help = ('Send the newsroom notification emails waiting in the outbox. '
+            'Run this regularly (e.g. every minute from cron).')
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int',
+                    default=100,
+                    help='Number of messages to fetch from the outbox at a '
+                         'time.'),
+    )
+
+    def handle_noargs(self, batch_size=100, **options):
+        verbosity = int(options.get('verbosity', 1))
+        sent, failed = send_queued_mail(batch_size=batch_size)
+        if verbosity and (sent or failed):
+            sys.stdout.write('Sent %s message%s, %s failed.\n' % (
+                sent, sent != 1 and 's' or '', failed))
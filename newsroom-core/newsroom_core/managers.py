@@ -1,5 +1,9 @@
 from django.db import models
 
+# The related objects shown for each assignment in listings.
+LISTING_RELATED = ('status', 'section', 'category', 'responsible',
+                   'created_by', 'parent')
+
 
 class AssignmentManager(models.Manager):
     use_for_related_fields = True
@@ -9,3 +13,96 @@ class AssignmentManager(models.Manager):
 
     def requests(self):
         return self.get_query_set().filter(confirmed=False)
+
+    def listing_assignments(self):
+        """
+        Assignments with the related objects shown in listings selected in the
+        same query.
+        """
+        return self.assignments().select_related(*LISTING_RELATED)
+
+    def listing_requests(self):
+        """
+        Requests with the related objects shown in listings selected in the
+        same query.
+        """
+        return self.requests().select_related(*LISTING_RELATED)
+
+    def load_related(self, assignments):
+        """
+        Fill the ``involved_users`` cache for a list of assignments and the
+        newsroom profile cache of every user shown with them (responsible,
+        creator, updater and involved), using two queries.
+
+        Returns the list of assignments.
+        """
+        from newsroom_core import models as newsroom_models
+        assignments = list(assignments)
+        if not assignments:
+            return assignments
+        from newsroom_core.utils.profile import load_profiles
+        users = []
+        for assignment in assignments:
+            assignment._involved_users = []
+            for name in ('responsible', 'created_by', 'updated_by'):
+                user = getattr(assignment, '_%s_cache' % name, None)
+                if user is not None:
+                    users.append(user)
+        by_pk = dict([(assignment.pk, assignment)
+                      for assignment in assignments])
+        through = newsroom_models.Assignment.involved.through
+        involved = through.objects.filter(assignment__in=by_pk.keys())\
+                                  .select_related('user')\
+                                  .order_by('user__first_name',
+                                            'user__last_name')
+        for row in involved:
+            by_pk[row.assignment_id]._involved_users.append(row.user)
+            users.append(row.user)
+        load_profiles(users)
+        return assignments
+
+    def load_values(self, assignments):
+        """
+        Fill the dynamic field values cache for a list of assignments using a
+        constant number of queries (rather than three queries per assignment).
+
+        The categories of the assignments are also loaded in bulk and shared
+        between assignments.
+
+        Returns the list of assignments.
+        """
+        from newsroom_core import models as newsroom_models
+        assignments = list(assignments)
+        by_pk = {}
+        for assignment in assignments:
+            if not hasattr(assignment, '_values'):
+                assignment._values = {}
+                by_pk[assignment.pk] = assignment
+        if by_pk:
+            value_models = (
+                (newsroom_models.AssignmentTextField, ['field']),
+                (newsroom_models.AssignmentBigTextField, ['field']),
+                (newsroom_models.AssignmentChoiceField, ['field', 'value']),
+            )
+            for value_model, related in value_models:
+                values = value_model.objects.filter(
+                    assignment__in=by_pk.keys()).select_related(*related)
+                for d in values:
+                    by_pk[d.assignment_id]._values[d.field] = d.value
+        self._load_categories(assignments)
+        return assignments
+
+    def _load_categories(self, assignments):
+        from newsroom_core import models as newsroom_models
+        categories = {}
+        for assignment in assignments:
+            category = getattr(assignment, '_category_cache', None)
+            if category is not None:
+                categories.setdefault(category.pk, category)
+        missing = set([a.category_id for a in assignments
+                       if a.category_id not in categories])
+        if missing:
+            categories.update(
+                newsroom_models.Category.objects.in_bulk(list(missing)))
+        for assignment in assignments:
+            assignment._category_cache = categories[assignment.category_id]
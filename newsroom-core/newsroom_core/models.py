@@ -1,11 +1,15 @@
 import datetime
-from django.db import models
+from django.db import models, router
+from django.db.models import signals
 from django.contrib.auth.models import User
 from django.contrib.contenttypes import generic
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
-from newsroom_core import managers
+from newsroom_core import changes, managers, search
+from newsroom_core.utils import activity, calendar, counts, people, rows, \
+    schema, serialize, workload
 from newsroom_core.utils.slugify import unique_slugify
-from newsroom_core.utils.mail import send_mail_from_template
+from newsroom_core.utils.mail import send_mass_mail_from_template
 
 
 class NewsroomProfile(models.Model):
@@ -25,6 +29,10 @@ class NewsroomProfile(models.Model):
     # Settings:
     is_editor = models.BooleanField()
     email_notifications = models.BooleanField()
+    email_digest = models.BooleanField(
+        help_text='Receive assignment comments and status changes as a '
+                  'single periodic email rather than one email each.'
+    )
     my_assignments_default = models.BooleanField()
     my_section_default = models.BooleanField()
 
@@ -115,14 +123,17 @@ class Category(models.Model):
         """
         An ordered list of property fields for this category.
         """
-        return [f.field for f in self.field_set.filter(is_property=True)]
+        return [f for f in self._get_fields() if f.is_property]
 
     @property
     def details(self):
         """
         An ordered list of detail fields for this category.
         """
-        return [f.field for f in self.field_set.filter(is_property=False)]
+        return [f for f in self._get_fields() if not f.is_property]
+
+    def _get_fields(self):
+        return schema.get_fields(self.pk)
 
 
 class CategoryField(models.Model):
@@ -222,18 +233,102 @@ class Assignment(BaseItem):
     parent = models.ForeignKey('self', related_name='children', blank=True,
                                null=True, editable=False)
     confirmed = models.BooleanField()
+    # Activity counters, kept up to date by ``newsroom_core.utils.activity``.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    child_request_count = models.PositiveIntegerField(default=0,
+                                                      editable=False)
+    child_assignment_count = models.PositiveIntegerField(default=0,
+                                                         editable=False)
+    last_activity_at = models.DateTimeField(blank=True, null=True,
+                                            editable=False)
 
     objects = managers.AssignmentManager()
 
+    # Fields whose original values are remembered so that changes to them can
+    # be detected when saving.
+    tracked_fields = ('title', 'pub_date', 'status_id', 'section_id',
+                      'confirmed', 'parent_id')
+
+    def __init__(self, *args, **kwargs):
+        super(Assignment, self).__init__(*args, **kwargs)
+        self._original = self._get_tracked()
+
     def __unicode__(self, *args, **kwargs):
         return self.title
 
     def save(self, *args, **kwargs):
+        new_slug = False
         if not self.parent:
             # All top-level assignments need slugs
-            if not self.slug or self.title != Assignment.objects.get(pk=self.pk).title:
+            if not self.slug or self.title != self._original['title']:
                 unique_slugify(self, self.title)
+                new_slug = True
+        created = not self.pk
+        if created:
+            self.last_activity_at = self.last_activity_at or self.created_at
         super(Assignment, self).save(*args, **kwargs)
+        if new_slug:
+            self._check_slug()
+        changed = self.changed_fields()
+        if created or [f for f in changed if f != 'title']:
+            # The calendar counts for both the old and new month are stale.
+            calendar.invalidate_assignment_day(self._original['pub_date'])
+            calendar.invalidate_assignment_day(self.pub_date)
+        if not created and ('status_id' in changed or 'confirmed' in changed):
+            counts.invalidate_user_counts(
+                list(self.involved.values_list('pk', flat=True)))
+        self._original = self._get_tracked()
+
+    def save_base(self, *args, **kwargs):
+        """
+        Leave the activity counters out of the ``UPDATE`` of an existing
+        assignment (they are only changed by ``newsroom_core.utils.activity``),
+        so saving an assignment loaded before they changed can't undo the
+        changes.
+        """
+        if not self.pk or kwargs.get('force_insert'):
+            return super(Assignment, self).save_base(*args, **kwargs)
+        if not kwargs.get('force_update'):
+            # Django would insert the expressions below if there is no row to
+            # update, so check for it here instead (which Django then skips).
+            using = kwargs.get('using') or router.db_for_write(Assignment,
+                                                               instance=self)
+            existing = Assignment._default_manager.using(using)
+            if not existing.filter(pk=self.pk).exists():
+                return super(Assignment, self).save_base(*args, **kwargs)
+            kwargs['force_update'] = True
+        # Django has no way to save only some fields, so the columns are set
+        # to themselves.
+        loaded = activity.exclude_from_save(self)
+        try:
+            return super(Assignment, self).save_base(*args, **kwargs)
+        finally:
+            activity.restore(self, loaded)
+
+    def _check_slug(self, attempts=5):
+        """
+        Make sure a newly allocated slug wasn't taken by a concurrent save of
+        another assignment (slugs aren't unique in the database as child
+        assignments don't have one). The assignment with the lower id keeps
+        the slug.
+        """
+        for i in range(attempts):
+            taken = Assignment.objects.filter(slug=self.slug, pk__lt=self.pk)
+            if not taken.count():
+                return
+            unique_slugify(self, self.title)
+            super(Assignment, self).save(secret_update=True)
+
+    def _get_tracked(self):
+        return dict([(f, getattr(self, f)) for f in self.tracked_fields])
+
+    def changed_fields(self):
+        """
+        Returns a list of the tracked fields which have changed since this
+        assignment was loaded (or last saved).
+        """
+        return [f for f in self.tracked_fields
+                if getattr(self, f) != self._original[f]]
 
     @models.permalink
     def get_absolute_url(self):
@@ -291,19 +386,34 @@ class Assignment(BaseItem):
                 details.append((field, value))
         return details
 
+    @property
+    def involved_users(self):
+        """
+        The users involved in this assignment, using the cache filled by
+        ``Assignment.objects.load_related`` if there is one.
+        """
+        if not hasattr(self, '_involved_users'):
+            Assignment.objects.load_related([self])
+        return self._involved_users
+
     def _get_values(self):
-        if hasattr(self, '_values'):
-            return self._values
-        values = dict([(d.field, d.value) for d in self.textfield_set.all()])
-        values.update([(d.field, d.value) for d in self.bigtextfield_set.all()])
-        values.update([(d.field, d.value) for d in self.choicefield_set.all()])
-        self._values = values
-        return values
+        if not hasattr(self, '_values'):
+            Assignment.objects.load_values([self])
+        return self._values
 
     def clear_values_cache(self):
         if hasattr(self, '_values'):
             del self._values
 
+    def values_changed(self):
+        """
+        Clear the cached dynamic field values, re-index the assignment and log
+        the change. Call this once after changing any number of its values.
+        """
+        self.clear_values_cache()
+        search.index_object(self)
+        changes.log_change(self, 'update')
+
     def first_detail_text(self):
         """
         Returns the value of the first filled in detail field.
@@ -346,13 +456,13 @@ class AssignmentComment(BaseItem):
         ordering = ('created_at',)
 
     def save(self, *args, **kwargs):
-        email = not self.id
+        # Pass ``notify=False`` to add a comment without notifying anyone.
+        email = kwargs.pop('notify', True) and not self.id
         super(AssignmentComment, self).save(*args, **kwargs)
         if email:
-            for user in self.assignment.involved.exclude(
-                                                        pk=self.created_by.pk):
-                c = {'comment': self, 'user': user}
-                send_mail_from_template(user.email, 'assignment_comment', c)
+            _notify_involved(self.assignment, self.created_by,
+                             'assignment_comment', {'comment': self},
+                             comment=self)
 
 
 class StatusHistory(models.Model):
@@ -369,10 +479,322 @@ class StatusHistory(models.Model):
         return '%s changed to %s' % (self.assignment, self.status)
 
     def save(self, *args, **kwargs):
-        email = not self.id
+        # Pass ``notify=False`` to add a change without notifying anyone.
+        email = kwargs.pop('notify', True) and not self.id
         super(StatusHistory, self).save(*args, **kwargs)
         if email:
-            for user in self.assignment.involved.exclude(pk=self.user.pk):
-                c = {'assignment': self.assignment, 'user': user}
-                send_mail_from_template(user.email, 'assignment_status_change',
-                                        c)
+            _notify_involved(self.assignment, self.user,
+                             'assignment_status_change',
+                             {'assignment': self.assignment},
+                             status_change=self)
+
+
+# Keep the cached category field schema up to date.
+for model in (Category, CategoryField, CategoryTextField, CategoryBigTextField,
+              CategoryChoiceField):
+    signals.post_save.connect(schema.invalidate, sender=model,
+                              dispatch_uid='newsroom-schema-%s' %
+                                           model._meta.module_name)
+    signals.post_delete.connect(schema.invalidate, sender=model,
+                                dispatch_uid='newsroom-schema-%s' %
+                                             model._meta.module_name)
+
+
+class DigestEvent(models.Model):
+    """
+    A comment or status change waiting to be sent to a user who has chosen to
+    receive notifications as a digest.
+    """
+    user = models.ForeignKey(User, related_name='digest_events')
+    assignment = models.ForeignKey(Assignment)
+    comment = models.ForeignKey(AssignmentComment, blank=True, null=True)
+    status_change = models.ForeignKey(StatusHistory, blank=True, null=True)
+    created_at = models.DateTimeField(default=datetime.datetime.now,
+                                      editable=False)
+
+    class Meta:
+        ordering = ('created_at',)
+
+
+def _notify_involved(assignment, exclude_user, template_name, context,
+                     **event):
+    """
+    Email everyone involved in an assignment (other than ``exclude_user``).
+
+    Users who prefer a digest get a ``DigestEvent`` (with the extra keyword
+    arguments) instead, to be sent by the ``newsroom_send_digests`` management
+    command.
+    """
+    users = list(assignment.involved.exclude(pk=exclude_user.pk))
+    if not users:
+        return
+    digest_ids = NewsroomProfile.objects.filter(
+        user__in=[user.pk for user in users], email_digest=True
+    ).values_list('user', flat=True)
+    digest_ids = set(digest_ids)
+    recipients = []
+    for user in users:
+        if user.pk in digest_ids:
+            DigestEvent.objects.create(user=user, assignment=assignment,
+                                       **event)
+        else:
+            c = dict(context, user=user)
+            recipients.append((user.email, c))
+    send_mass_mail_from_template(template_name, recipients)
+
+
+class QueuedMail(models.Model):
+    """
+    An outgoing email waiting in the outbox to be sent by the
+    ``newsroom_send_mail`` management command.
+    """
+    to = models.EmailField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created_at = models.DateTimeField(default=datetime.datetime.now,
+                                      editable=False)
+    next_attempt = models.DateTimeField(default=datetime.datetime.now,
+                                        db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('next_attempt',)
+        verbose_name = 'queued mail'
+        verbose_name_plural = 'queued mail'
+
+    def __unicode__(self):
+        return '%s: %s' % (self.to, self.subject)
+
+
+class SearchDocument(models.Model):
+    """
+    An object in the search index (see ``newsroom_core.search``).
+    """
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    content_object = generic.GenericForeignKey()
+    title = models.CharField(max_length=250)
+    url = models.CharField(max_length=250, blank=True)
+    excerpt = models.TextField(blank=True)
+    length = models.PositiveIntegerField(default=0)
+    updated_on = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = (('content_type', 'object_id'),)
+
+    def __unicode__(self):
+        return self.title
+
+
+class SearchTerm(models.Model):
+    """
+    A term of a document in the search index, weighted by the number of times
+    (and where) it occurs in the document.
+    """
+    document = models.ForeignKey(SearchDocument, related_name='terms')
+    term = models.CharField(max_length=50, db_index=True)
+    weight = models.PositiveIntegerField()
+
+
+class Change(models.Model):
+    """
+    A log of the changes to assignments, comments and status history, read by
+    the change feed (see ``newsroom_core.changes``). Deleted objects are only
+    remembered here, as a tombstone.
+    """
+    ACTIONS = (
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    )
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    date = models.DateTimeField(default=datetime.datetime.now, editable=False)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __unicode__(self):
+        return '%s %s %s' % (self.content_type, self.object_id,
+                             self.get_action_display().lower())
+
+
+class Workload(models.Model):
+    """
+    The number of assignments and requests in a section and status which a
+    user is involved in, kept up to date by ``newsroom_core.utils.workload``.
+    """
+    user = models.ForeignKey(User, related_name='workload')
+    section = models.ForeignKey(Section)
+    status = models.ForeignKey(Status)
+    assignments = models.PositiveIntegerField(default=0)
+    requests = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('user', 'section', 'status'),)
+
+    def __unicode__(self):
+        return '%s: %s %s' % (self.user, self.section, self.status)
+
+
+class AssignmentIndex(search.SearchIndex):
+    def get_text(self, obj):
+        cached = hasattr(obj, '_values')
+        text = [(obj.title, search.TITLE_WEIGHT)]
+        text.extend([(unicode(value), 1)
+                     for value in obj._get_values().values()])
+        if not cached:
+            # Values are often added after the assignment is saved (and
+            # indexed), so don't keep them loaded.
+            obj.clear_values_cache()
+        return text
+
+
+class AssignmentCommentIndex(search.SearchIndex):
+    def get_title(self, obj):
+        return u'Comment on %s' % obj.assignment
+
+    def get_text(self, obj):
+        return [(obj.comment, 1)]
+
+    def get_url(self, obj):
+        return obj.assignment.get_absolute_url()
+
+
+search.register(Assignment, AssignmentIndex)
+search.register(AssignmentComment, AssignmentCommentIndex)
+
+
+def _assignment_deleted(sender, instance, **kwargs):
+    calendar.invalidate_assignment_day(instance._original['pub_date'])
+
+
+def _assignment_pre_delete(sender, instance, **kwargs):
+    # The involved users are gone by the time the assignment is deleted.
+    counts.invalidate_user_counts(
+        list(instance.involved.values_list('pk', flat=True)))
+
+
+def _involved_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # The assignments of a user changed.
+        counts.invalidate_user_counts([instance.pk])
+    elif action == 'pre_clear':
+        counts.invalidate_user_counts(
+            list(instance.involved.values_list('pk', flat=True)))
+    else:
+        counts.invalidate_user_counts(list(pk_set or []))
+
+
+def _user_init(sender, instance, **kwargs):
+    # Don't load deferred names just to keep track of them.
+    instance._newsroom_name = (instance.__dict__.get('first_name'),
+                               instance.__dict__.get('last_name'))
+
+
+def _user_saved(sender, instance, created, **kwargs):
+    # Every login saves the user, which changes nothing that is shown.
+    name = (instance.first_name, instance.last_name)
+    if created or name != getattr(instance, '_newsroom_name', None):
+        people.invalidate()
+        rows.invalidate()
+    instance._newsroom_name = name
+
+
+def _user_deleted(sender, instance, **kwargs):
+    people.invalidate()
+    rows.invalidate()
+
+
+def _involved_logged(sender, instance, action, reverse, pk_set, **kwargs):
+    # The people involved are saved after the assignment itself.
+    if action == 'pre_clear' and reverse:
+        for assignment in instance.assignments_involved.all():
+            changes.log_change(assignment, 'update')
+    elif action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        changes.log_change(instance, 'update')
+    elif action in ('post_add', 'post_remove'):
+        for assignment in Assignment.objects.filter(pk__in=list(pk_set or [])):
+            changes.log_change(assignment, 'update')
+
+
+# Keep the cached calendar counts up to date.
+signals.post_delete.connect(_assignment_deleted, sender=Assignment,
+                            dispatch_uid='newsroom-calendar-assignment')
+signals.post_save.connect(calendar.invalidate_calendar, sender=Status,
+                          dispatch_uid='newsroom-calendar-status')
+signals.post_delete.connect(calendar.invalidate_calendar, sender=Status,
+                            dispatch_uid='newsroom-calendar-status')
+
+# Keep the cached user assignment counts up to date.
+signals.pre_delete.connect(_assignment_pre_delete, sender=Assignment,
+                           dispatch_uid='newsroom-counts-assignment')
+signals.m2m_changed.connect(_involved_changed,
+                            sender=Assignment.involved.through,
+                            dispatch_uid='newsroom-counts-involved')
+
+# Keep the cached choices of people for the assignment forms up to date (users
+# are handled along with the cached rows, below).
+for model in (NewsroomProfile, Section):
+    signals.post_save.connect(people.invalidate, sender=model,
+                              dispatch_uid='newsroom-people-%s' %
+                                           model._meta.module_name)
+    signals.post_delete.connect(people.invalidate, sender=model,
+                                dispatch_uid='newsroom-people-%s' %
+                                             model._meta.module_name)
+
+# Keep the cached listing rows up to date. Their generation also dates the
+# pages answered with a 304 (see ``decorators.conditional_page``), so it moves
+# on whenever anything shown alongside the assignments changes.
+for model in (Status, Section, Category, CategoryField, CategoryTextField,
+              CategoryBigTextField, CategoryChoiceField,
+              CategoryChoiceFieldChoice, NewsroomProfile):
+    signals.post_save.connect(rows.invalidate, sender=model,
+                              dispatch_uid='newsroom-rows-%s' %
+                                           model._meta.module_name)
+    signals.post_delete.connect(rows.invalidate, sender=model,
+                                dispatch_uid='newsroom-rows-%s' %
+                                             model._meta.module_name)
+signals.post_init.connect(_user_init, sender=User,
+                          dispatch_uid='newsroom-rows-user')
+signals.post_save.connect(_user_saved, sender=User,
+                          dispatch_uid='newsroom-rows-user')
+signals.post_delete.connect(_user_deleted, sender=User,
+                            dispatch_uid='newsroom-rows-user')
+
+
+# Keep the workload summary up to date.
+signals.post_save.connect(workload.assignment_saved, sender=Assignment,
+                          dispatch_uid='newsroom-workload-assignment')
+signals.pre_delete.connect(workload.assignment_pre_delete, sender=Assignment,
+                           dispatch_uid='newsroom-workload-assignment')
+signals.m2m_changed.connect(workload.involved_changed,
+                            sender=Assignment.involved.through,
+                            dispatch_uid='newsroom-workload-involved')
+
+# Keep the activity counters of assignments up to date.
+signals.post_save.connect(activity.comment_saved, sender=AssignmentComment,
+                          dispatch_uid='newsroom-activity-comment')
+signals.post_delete.connect(activity.comment_deleted, sender=AssignmentComment,
+                            dispatch_uid='newsroom-activity-comment')
+signals.post_save.connect(activity.status_change_saved, sender=StatusHistory,
+                          dispatch_uid='newsroom-activity-status')
+signals.post_save.connect(activity.assignment_saved, sender=Assignment,
+                          dispatch_uid='newsroom-activity-assignment')
+# The parent of a deleted assignment is cleared before post_delete is sent.
+signals.pre_delete.connect(activity.assignment_deleted, sender=Assignment,
+                           dispatch_uid='newsroom-activity-assignment')
+
+
+# Log changes for the change feed.
+changes.register(Assignment, lambda queryset: serialize.serialize_assignments(
+                                serialize.assignment_queryset(queryset)))
+changes.register(AssignmentComment, serialize.serialize_comments)
+changes.register(StatusHistory, serialize.serialize_status_changes)
+signals.m2m_changed.connect(_involved_logged,
+                            sender=Assignment.involved.through,
+                            dispatch_uid='newsroom-changes-involved')
@@ -0,0 +1,242 @@
+"""
+A simple full-text search for the newsroom, using an inverted index stored in
+the database.
+
+Models are added to the index by registering a ``SearchIndex`` for them
+(usually at the bottom of an application's ``models.py``)::
+
+    from newsroom_core import search
+
+    class PageIndex(search.SearchIndex):
+        def get_text(self, obj):
+            return [(obj.title, search.TITLE_WEIGHT), (obj.content, 1)]
+
+    search.register(Page, PageIndex)
+
+Registered objects are re-indexed whenever they are saved and removed from
+the index when they are deleted. The ``newsroom_rebuild_index`` management
+command indexes everything from scratch.
+"""
+import math
+import re
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import signals
+from django.utils.encoding import force_unicode
+from django.utils.text import truncate_words
+
+TITLE_WEIGHT = 5
+MAX_TERM_LENGTH = 50
+RE_TOKEN = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = set([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in',
+    'into', 'is', 'it', 'no', 'not', 'of', 'on', 'or', 'such', 'that', 'the',
+    'their', 'then', 'there', 'these', 'they', 'this', 'to', 'was', 'will',
+    'with',
+])
+
+_registry = {}
+
+
+class SearchIndex(object):
+    """
+    Describes how to index the objects of a model. Subclass it and override
+    ``get_text`` (and any other methods as needed).
+    """
+    def __init__(self, model):
+        self.model = model
+
+    def get_title(self, obj):
+        return force_unicode(obj)
+
+    def get_text(self, obj):
+        """
+        Returns a list of ``(text, weight)`` tuples to index for an object.
+        """
+        return [(self.get_title(obj), TITLE_WEIGHT)]
+
+    def get_url(self, obj):
+        return obj.get_absolute_url()
+
+    def get_updated_on(self, obj):
+        return getattr(obj, 'updated_on', None)
+
+    def should_index(self, obj):
+        return True
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+
+def register(model, index_class=SearchIndex):
+    """
+    Register a model to be searched, keeping its objects indexed as they are
+    saved and deleted.
+    """
+    _registry[model] = index_class(model)
+    uid = 'newsroom-search-%s-%s' % (model._meta.app_label,
+                                     model._meta.module_name)
+    signals.post_save.connect(_object_saved, sender=model, dispatch_uid=uid)
+    signals.post_delete.connect(_object_deleted, sender=model, dispatch_uid=uid)
+
+
+def get_registered_models():
+    return _registry.keys()
+
+
+def tokenize(text):
+    """
+    Split text into a list of lower case search terms, ignoring stop words
+    and single characters.
+    """
+    tokens = []
+    for token in RE_TOKEN.findall(force_unicode(text).lower()):
+        if len(token) > 1 and token not in STOP_WORDS:
+            tokens.append(token[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def get_terms(text_weights):
+    """
+    Returns a dictionary mapping each term to its total weight for a list of
+    ``(text, weight)`` tuples.
+    """
+    terms = {}
+    for text, weight in text_weights:
+        if not text:
+            continue
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0) + weight
+    return terms
+
+
+def index_object(obj):
+    """
+    Add or update an object in the search index.
+
+    Only the terms which have changed since the object was last indexed are
+    written.
+    """
+    from newsroom_core import models
+    index = _registry.get(obj.__class__)
+    if not index:
+        return
+    if not index.should_index(obj):
+        unindex_object(obj)
+        return
+    content_type = ContentType.objects.get_for_model(obj)
+    text_weights = index.get_text(obj)
+    terms = get_terms(text_weights)
+    text = u' '.join([force_unicode(text) for text, weight in text_weights
+                      if text and weight < TITLE_WEIGHT])
+    document, created = models.SearchDocument.objects.get_or_create(
+        content_type=content_type, object_id=obj.pk,
+        defaults={'title': ''}
+    )
+    document.title = index.get_title(obj)[:250]
+    document.url = index.get_url(obj)
+    document.excerpt = truncate_words(text, 40)
+    document.length = sum(terms.values())
+    document.updated_on = index.get_updated_on(obj)
+    document.save()
+
+    existing = {}
+    if not created:
+        for pk, term, weight in document.terms.values_list('pk', 'term',
+                                                           'weight'):
+            existing[term] = (pk, weight)
+    removed = [pk for term, (pk, weight) in existing.items()
+               if term not in terms]
+    if removed:
+        models.SearchTerm.objects.filter(pk__in=removed).delete()
+    for term, weight in terms.items():
+        if term not in existing:
+            models.SearchTerm.objects.create(document=document, term=term,
+                                             weight=weight)
+        elif existing[term][1] != weight:
+            models.SearchTerm.objects.filter(pk=existing[term][0])\
+                                     .update(weight=weight)
+
+
+def unindex_object(obj):
+    """
+    Remove an object from the search index.
+    """
+    from newsroom_core import models
+    content_type = ContentType.objects.get_for_model(obj)
+    documents = models.SearchDocument.objects.filter(
+        content_type=content_type, object_id=obj.pk)
+    models.SearchTerm.objects.filter(document__in=documents).delete()
+    documents.delete()
+
+
+def search(query, limit=50, models=None):
+    """
+    Returns a list of the search documents best matching a query, each with a
+    ``score`` attribute.
+
+    Every word in the query must match the start of a term in a document.
+    Whole word matches and matches in titles rank higher, and words which are
+    found in fewer documents count for more.
+
+    Optionally, ``models`` limits the results to a list of models.
+    """
+    from newsroom_core import models as newsroom_models
+    tokens = []
+    for token in tokenize(query):
+        if token not in tokens:
+            tokens.append(token)
+    if not tokens:
+        return []
+    documents = newsroom_models.SearchDocument.objects.all()
+    terms = newsroom_models.SearchTerm.objects.all()
+    if models:
+        content_types = [ContentType.objects.get_for_model(model)
+                         for model in models]
+        documents = documents.filter(content_type__in=content_types)
+        terms = terms.filter(document__content_type__in=content_types)
+    total = documents.count()
+    if not total:
+        return []
+    scores = None
+    for token in tokens:
+        matches = terms.filter(term__startswith=token)
+        if scores is not None and len(scores) < 1000:
+            matches = matches.filter(document__in=scores.keys())
+        token_scores = {}
+        for document_id, term, weight in matches.values_list('document',
+                                                             'term', 'weight'):
+            if term != token:
+                # Prefix matches count for less than whole words.
+                weight = weight / 2.0
+            token_scores[document_id] = token_scores.get(document_id, 0) + \
+                                        weight
+        if not token_scores:
+            return []
+        idf = math.log(1 + float(total) / len(token_scores))
+        if scores is None:
+            scores = dict([(pk, score * idf) for pk, score in
+                           token_scores.items()])
+        else:
+            scores = dict([(pk, score + token_scores[pk] * idf) for pk, score
+                           in scores.items() if pk in token_scores])
+    ranked = sorted(scores.items(), key=lambda bits: bits[1], reverse=True)
+    ranked = ranked[:limit]
+    documents = newsroom_models.SearchDocument.objects.select_related(
+                    'content_type').in_bulk([pk for pk, score in ranked])
+    results = []
+    for pk, score in ranked:
+        document = documents.get(pk)
+        if document:
+            # Favour shorter documents a little.
+            document.score = score / math.log(math.e + document.length)
+            results.append(document)
+    results.sort(key=lambda document: document.score, reverse=True)
+    return results
+
+
+def _object_saved(sender, instance, **kwargs):
+    index_object(instance)
+
+
+def _object_deleted(sender, instance, **kwargs):
+    unindex_object(instance)
@@ -0,0 +1,7 @@
+-- Indexes for the common assignment lookups (also added to existing
+-- databases by the composite_indexes evolution).
+CREATE INDEX newsroom_core_assignment_confirmed_pub_date ON newsroom_core_assignment (confirmed, pub_date);
+CREATE INDEX newsroom_core_assignment_confirmed_section_pub_date ON newsroom_core_assignment (confirmed, section_id, pub_date);
+CREATE INDEX newsroom_core_assignment_parent_confirmed ON newsroom_core_assignment (parent_id, confirmed);
+CREATE INDEX newsroom_core_assignment_confirmed_updated_on ON newsroom_core_assignment (confirmed, updated_on);
+CREATE INDEX newsroom_core_assignment_confirmed_last_activity_at ON newsroom_core_assignment (confirmed, last_activity_at);
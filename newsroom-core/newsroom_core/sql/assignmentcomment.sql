@@ -0,0 +1,2 @@
+-- Also added to existing databases by the composite_indexes evolution.
+CREATE INDEX newsroom_core_assignmentcomment_assignment_created_at ON newsroom_core_assignmentcomment (assignment_id, created_at);
@@ -0,0 +1,2 @@
+-- Also added to existing databases by the composite_indexes evolution.
+CREATE INDEX newsroom_core_statushistory_assignment_date ON newsroom_core_statushistory (assignment_id, date DESC);
@@ -1,21 +1,35 @@
 import datetime
 from django import template
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count
 from django.core.urlresolvers import reverse
+from django.template.loader import get_template
+from django.utils.hashcompat import md5_constructor
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 from newsroom_core import models
+from newsroom_core.instrumentation import timed_tag
+from newsroom_core.templatetags.fuzzytime import fuzzytime
+from newsroom_core.utils import rows as row_cache
 from newsroom_core.utils.calendar import assignment_day_url
 
 
 register = template.Library()
 
+# Stands in for the time since an assignment was created in cached rows, as
+# it changes with every minute.
+CREATED_MARKER = '<!--newsroom-created-->'
+
 
 class GetStatusesNode(template.Node):
-    def __init__(self, output_name, day_var, queryset_var):
+    def __init__(self, output_name, day_var=None, queryset_var=None):
         self.output_name = output_name
         self.day_var = day_var
         self.queryset_var = queryset_var
         super(GetStatusesNode, self).__init__()
 
+    @timed_tag('get_statuses')
     def render(self, context):
         if self.queryset_var:
             self.assignments = self.queryset_var.resolve(context)
@@ -24,10 +38,12 @@ class GetStatusesNode(template.Node):
         else:
             self.assignments = models.Assignment.objects.assignments()
         statuses = list(models.Status.objects.all())
+        counts, my_counts = self.count_assignments(context)
         total = 0
         my_total = 0
         for status in statuses:
-            all, my = self.count_assignments(status, context)
+            all = counts.get(status.pk, 0)
+            my = my_counts.get(status.pk, 0)
             status.assignments_count, status.my_assignments_count = all, my
             total += all
             my_total += my
@@ -36,20 +52,32 @@ class GetStatusesNode(template.Node):
         context['%s_my_assignments_total' % self.output_name] = my_total
         return ''
 
-    def count_assignments(self, status, context):
-        user = context['user']
-        day = None
-        assignments = self.assignments.filter(status=status)
+    def count_assignments(self, context):
+        """
+        Returns two dictionaries mapping status ids to the count of all
+        assignments and the count of assignments the user is involved in.
+
+        Each dictionary is calculated with a single grouped query (rather than
+        a couple of queries per status).
+        """
+        user = context.get('user')
+        assignments = self.assignments
         if self.day_var:
             day = self.day_var.resolve(context)
             if not isinstance(day, datetime.date):
-                return 0, 0
+                return {}, {}
             assignments = assignments.filter(pub_date=day)
+        counts = self._group_count(assignments)
         if user and user.is_authenticated():
-            my_assignments_count = assignments.filter(involved=user).count()
+            my_counts = self._group_count(assignments.filter(involved=user))
         else:
-            my_assignments_count = 0
-        return assignments.count(), my_assignments_count
+            my_counts = {}
+        return counts, my_counts
+
+    def _group_count(self, assignments):
+        counts = assignments.order_by().values('status')\
+                            .annotate(count=Count('pk'))
+        return dict([(row['status'], row['count']) for row in counts])
 
 
 class AssignmentsUpcoming(template.Node):
@@ -59,6 +87,7 @@ class AssignmentsUpcoming(template.Node):
         self.queryset_var = queryset_var
         super(AssignmentsUpcoming, self).__init__()
 
+    @timed_tag('assignments_upcoming')
     def render(self, context):
         count = self.count_var.resolve(context)
         try:
@@ -74,19 +103,24 @@ class AssignmentsUpcoming(template.Node):
                 return ''
         else:
             all_assignments = models.Assignment.objects.assignments()
-        all_assignments = all_assignments.order_by('-created_at')
-        current_days = 0
-        i = 0
         # Get count days, looking forwards one week more than count in case of
-        # blank days.
-        while current_days < count and i < 7 + count:
-            assignments = all_assignments.filter(pub_date=day)
-            if assignments:
-                url = assignment_day_url(day)
-                upcoming.append((day, url, assignments))
-                current_days += 1
-            i += 1
-            day += datetime.timedelta(days=1)
+        # blank days. The whole window is fetched with a single query and
+        # grouped by day.
+        last_day = day + datetime.timedelta(days=6 + count)
+        all_assignments = all_assignments.filter(pub_date__gte=day,
+                                                 pub_date__lte=last_day)
+        all_assignments = all_assignments.order_by('pub_date', '-created_at')
+        for assignment in all_assignments:
+            if not upcoming or upcoming[-1][0] != assignment.pub_date:
+                if len(upcoming) >= count:
+                    break
+                day = assignment.pub_date
+                upcoming.append((day, assignment_day_url(day), []))
+            upcoming[-1][2].append(assignment)
+        # Load the people shown in the rows of every day at once.
+        models.Assignment.objects.load_related(
+            [assignment for day, url, assignments in upcoming
+             for assignment in assignments])
         context[self.output_name] = upcoming
         return ''
 
@@ -148,8 +182,8 @@ def get_statuses(parser, token):
 def assignments_upcoming(parser, token):
     """
     Return a list of tuples containing a date, a url to assignments for only
-    that day and a queryset of assignments for that day (ordered by most
-    recently created).
+    that day and a list of assignments for that day (ordered by most recently
+    created).
 
     The number of days that are returned is determined by the one and only
     argument passed to this tag. For example::
@@ -180,15 +214,79 @@ def assignments_upcoming(parser, token):
 @register.inclusion_tag('newsroom/tags/list_assignments.html',
                         takes_context=True)
 def list_assignments(context, assignments):
-    return {
-        'assignments': assignments,
-        'more': context.get('more'),
+    """
+    List assignments in a table.
+
+    Each row is cached, keyed by the assignment's id, last update and activity
+    counters along with the options which change how the row is shown, so a
+    list is usually built from a single cache lookup. Saving a status,
+    section, category or person clears every row (see
+    ``newsroom_core.utils.rows``), and the time since each assignment was
+    created is filled in after the rows are fetched.
+
+    The people shown in the rows aren't loaded here, as a page may list
+    several groups of assignments: views load them in bulk for the whole page
+    (see ``Assignment.objects.load_related``).
+    """
+    flags = {
         'current_section': context.get('current_section'),
         'request': context.get('request'),
-        'url': context.get('url'),
         'compiled': context.get('compiled'),
         'assignments_profile': 'for_user' in context,
     }
+    return {
+        'rows': _render_rows(assignments or [], flags),
+        'more': context.get('more'),
+        'current_section': flags['current_section'],
+        'url': context.get('url'),
+    }
+
+
+def _row_key(assignment, variant):
+    # The activity counters change without touching ``updated_on``.
+    return 'newsroom-row-%s-%s-%s-%s-%s' % (
+        assignment.pk, assignment.updated_on.strftime('%Y%m%d%H%M%S%f'),
+        assignment.comment_count, assignment.child_request_count, variant)
+
+
+def _render_rows(assignments, flags):
+    assignments = list(assignments)
+    if not assignments:
+        return []
+    current_section = flags['current_section']
+    variant = [row_cache.get_generation(),
+               flags['compiled'] and 'c' or '',
+               flags['assignments_profile'] and 'p' or '',
+               # The people pages set a placeholder string to hide sections.
+               unicode(getattr(current_section, 'pk', current_section or ''))]
+    request = flags['request']
+    if request and not (flags['compiled'] or flags['assignments_profile']):
+        # The section links keep the rest of the query string.
+        variant.append(request.GET.urlencode())
+    variant = md5_constructor('-'.join(variant)).hexdigest()
+    keys = [_row_key(assignment, variant) for assignment in assignments]
+    cached = cache.get_many(keys)
+    misses = [assignment for key, assignment in zip(keys, assignments)
+              if key not in cached]
+    if misses:
+        row_template = get_template('newsroom/tags/list_assignments_row.html')
+    missing = {}
+    rows = []
+    for key, assignment in zip(keys, assignments):
+        row = cached.get(key)
+        if row is None:
+            row_context = dict(flags, assignment=assignment,
+                               created_marker=mark_safe(CREATED_MARKER))
+            row = row_template.render(template.Context(row_context))
+            missing[key] = row
+        if not flags['compiled']:
+            created = escape(fuzzytime(assignment.created_at))
+            row = row.replace(CREATED_MARKER, created)
+        rows.append(mark_safe(row))
+    if missing:
+        timeout = getattr(settings, 'NEWSROOM_ROW_CACHE_TIMEOUT', 300)
+        cache.set_many(missing, timeout)
+    return rows
 
 
 @register.simple_tag
@@ -2,7 +2,9 @@ import re
 import datetime
 from django import template
 from newsroom_core import models
-from newsroom_core.utils.calendar import assignment_day_url, assignment_day_url
+from newsroom_core.instrumentation import timed_tag
+from newsroom_core.utils.calendar import assignment_day_url, \
+    count_assignment_days, get_assignment_days
 
 register = template.Library()
 RE_CAL = re.compile(r'^([a-z]{3})(\d{4})', re.IGNORECASE)
@@ -12,6 +14,11 @@ MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct',
 
 @register.inclusion_tag('newsroom/tags/calendar.html', takes_context=True)
 def newsroom_calendar(context, days, assignments=None):
+    return _newsroom_calendar(context, days, assignments)
+
+
+@timed_tag('newsroom_calendar')
+def _newsroom_calendar(context, days, assignments=None):
     try:
         days = int(days)
     except (TypeError, ValueError):
@@ -31,17 +38,10 @@ def newsroom_calendar(context, days, assignments=None):
     last_day = day + datetime.timedelta(days=days)
 
     if assignments is None:
-        assignments = models.Assignment.objects.assignments()
-    assignments = assignments.filter(pub_date__gte=day, pub_date__lte=last_day)
-
-    assignment_days = {}
-    for assignment in assignments:
-        unfinished, finished = assignment_days.setdefault(assignment.pub_date,
-                                                          ([], []))
-        if assignment.status.means_completed:
-            finished.append(assignment)
-        else:
-            unfinished.append(assignment)
+        assignment_days = get_assignment_days(day, last_day)
+    else:
+        assignment_days = count_assignment_days(
+            assignments.filter(pub_date__gte=day, pub_date__lte=last_day))
 
     calendar = []
     day1 = None
@@ -49,8 +49,8 @@ def newsroom_calendar(context, days, assignments=None):
         if not day1 and day.day == 1:
             day1 = day
         url = assignment_day_url(day)
-        unfinished, finished = assignment_days.get(day, ([], []))
-        calendar.append((day, url, len(unfinished), len(finished)))
+        unfinished, finished = assignment_days.get(day, (0, 0))
+        calendar.append((day, url, unfinished, finished))
         day += datetime.timedelta(days=1)
 
     c = {'calendar': calendar, 'this_year': str(datetime.date.today().year),
@@ -1,5 +1,6 @@
 from django import template
 from django.utils.safestring import mark_safe
+from newsroom_core.utils.counts import get_user_counts
 from newsroom_core.utils.profile import get_profile
 
 
@@ -28,6 +29,32 @@ def do_get_profile(parser, token):
     return ProfileNode(user_var=user_var, context_name=context_name)
 
 
+class UserCountsNode(ProfileNode):
+    def render(self, context):
+        user = self.user_var.resolve(context)
+        context[self.context_name] = get_user_counts(user,
+                                                     context.get('request'))
+        return ''
+
+
+@register.tag('get_user_counts')
+def do_get_user_counts(parser, token):
+    """
+    Set a context variable to the counts of the (unfinished) assignments and
+    requests a user is involved in::
+
+        {% get_user_counts user as counts %}
+        {{ counts.assignments }} assignments, {{ counts.requests }} requests
+    """
+    bits = token.split_contents()
+    if len(bits) != 4 or bits[2] != 'as':
+        raise template.TemplateSyntaxError('Expected format {%% %s user_var as '
+                                           'context_name %%}' % bits[0])
+    user_var = parser.compile_filter(bits[1])
+    context_name = bits[3]
+    return UserCountsNode(user_var=user_var, context_name=context_name)
+
+
 @register.inclusion_tag('newsroom/tags/profile.html')
 def profile(user):
     """
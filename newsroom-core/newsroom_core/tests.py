@@ -1,14 +1,39 @@
+import datetime
+import re
+import sys
+from StringIO import StringIO
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.db.models import Q
+from django.http import HttpRequest, HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase
+from django.utils import simplejson
 from django.utils.datastructures import MultiValueDict
-from newsroom_core import models
+from newsroom_core import forms, instrumentation, models
+from newsroom_core import search
+from newsroom_core.utils import activity, people, workload
+from newsroom_core.utils.benchmark import diff_queries, measure, \
+    reset_caches
+from newsroom_core.utils.calendar import get_assignment_days
+from newsroom_core.views import assignments as assignments_views
+from newsroom_core.utils.mail import ConsoleConnection, get_mail_templates, \
+    send_digests, send_mail_from_template, send_mass_mail_from_template, \
+    send_queued_mail
 from newsroom_core.utils.profile import get_profile
 
 
-class BaseTest(TestCase):
+class NewsroomFixtures(object):
+    """
+    The users, section, category and statuses most tests work with.
+    """
     def setUp(self):
+        # Don't let cached counts leak between tests.
+        cache.clear()
         self.user = User.objects.create(username='tester', first_name='Test',
                                         last_name='Er', email='test@test.com')
         self.user.set_password('pw')
@@ -51,6 +76,77 @@ class BaseTest(TestCase):
         assignment.involved.add(user)
         return assignment
 
+    def count_queries(self, func, *args, **kwargs):
+        """
+        Returns the number of database queries made by calling a function.
+        """
+        return len(measure(func, *args, **kwargs)[2])
+
+
+class BaseTest(NewsroomFixtures, TestCase):
+    pass
+
+
+class BudgetTest(BaseTest):
+    """
+    Pins the number of queries made by pages.
+
+    Subclasses list the pages to check in ``BUDGETS``, as a dictionary of URL
+    name to the maximum number of queries, and implement ``get_url`` and
+    ``create_rows``. ``assertBudgets`` then measures every page with each of
+    the fixture ``SIZES`` (which can be overridden with the
+    ``NEWSROOM_QUERY_BUDGET_SIZES`` setting for quicker runs), and fails if a
+    page goes over its budget or makes more queries as the data grows, with a
+    diff of the queries made.
+    """
+    SIZES = (10, 100, 1000)
+    BUDGETS = {}
+
+    def get_url(self, name):
+        raise NotImplementedError
+
+    def create_rows(self, count):
+        """
+        Add ``count`` assignments to the database.
+        """
+        raise NotImplementedError
+
+    def measure_page(self, url):
+        # Measure uncached pages, including the caches kept by the process.
+        reset_caches()
+        response, elapsed, queries = measure(self.client.get, url)
+        self.assertEqual(response.status_code, 200,
+                         '%s returned %s' % (url, response.status_code))
+        return queries
+
+    def assertBudgets(self):
+        sizes = sorted(getattr(settings, 'NEWSROOM_QUERY_BUDGET_SIZES',
+                               self.SIZES))
+        failures = []
+        baselines = {}
+        created = 0
+        for size in sizes:
+            self.create_rows(size - created)
+            created = size
+            for name, max_queries in sorted(self.BUDGETS.items()):
+                url = self.get_url(name)
+                queries = self.measure_page(url)
+                base_size, base_queries = baselines.setdefault(
+                    name, (size, queries))
+                if len(queries) > max_queries:
+                    failures.append(['%s with %s assignments made %s queries '
+                                     '(budget %s):' % (url, size, len(queries),
+                                                       max_queries)] +
+                                    diff_queries(base_queries, queries))
+                elif len(queries) != len(base_queries):
+                    failures.append(['%s made %s queries with %s assignments '
+                                     'but %s with %s:' % (
+                                         url, len(base_queries), base_size,
+                                         len(queries), size)] +
+                                    diff_queries(base_queries, queries))
+        if failures:
+            self.fail('\n\n'.join(['\n'.join(lines) for lines in failures]))
+
 
 class DynamicFieldTest(BaseTest):
     def setUp(self):
@@ -83,6 +179,19 @@ class DynamicFieldTest(BaseTest):
                                                                   flat=True)
         self.assertEqual(list(choices), ['choice1', 'choice2', 'choice3'])
 
+    def test_schema_invalidation(self):
+        property_names = [f.name for f in self.category.properties]
+        self.assertEqual(property_names, ['Field 1', 'Field 2', 'Field 3'])
+        f = models.CategoryTextField.objects.create(
+            category=self.category, name='Field 4', required=False, length=10
+        )
+        property_names = [f.name for f in self.category.properties]
+        self.assertEqual(property_names, ['Field 1', 'Field 2', 'Field 3',
+                                          'Field 4'])
+        models.CategoryField.objects.get(name='Field 2').delete()
+        property_names = [f.name for f in self.category.properties]
+        self.assertEqual(property_names, ['Field 1', 'Field 3', 'Field 4'])
+
     def test_assignment(self):
         assignment = self.create_assignment(title='Test Article')
 
@@ -114,6 +223,45 @@ class DynamicFieldTest(BaseTest):
                     (u'Field 3', u'choice1')]
         self.assertEqual(properties, expected)
 
+    def test_load_values(self):
+        a1 = self.create_assignment(title='Test Article')
+        a2 = self.create_assignment(title='Test Article')
+        f = self.category.field_set.get(name='Field 1').field
+        f.values.create(assignment=a1, value='1')
+        f.values.create(assignment=a2, value='2')
+        f = self.category.field_set.get(name='Field 3').field
+        f.values.create(assignment=a2, value=f.choices.all()[0])
+
+        assignments = models.Assignment.objects.order_by('pk')
+        assignments = models.Assignment.objects.load_values(assignments)
+        self.assertEqual([hasattr(a, '_values') for a in assignments],
+                         [True, True])
+        self.assert_(assignments[0].category is assignments[1].category)
+
+        properties = [[(f.name, unicode(v)) for f, v in a.properties]
+                      for a in assignments]
+        expected = [[(u'Field 1', u'1')],
+                    [(u'Field 1', u'2'), (u'Field 3', u'choice1')]]
+        self.assertEqual(properties, expected)
+
+    def test_save_values(self):
+        assignment = self.create_assignment(title='Test Article')
+        choice = self.category.field_set.get(name='Field 3').field\
+                     .choices.all()[0]
+        form = forms.AssignmentPropertiesForm(instance=assignment, data={
+            'generic_property_Field 1': 'zeppelin',
+            'generic_property_Field 3': choice.pk,
+        })
+        self.assert_(form.is_valid(), form.errors)
+        form.save()
+        # The values are indexed once they have all been saved.
+        self.assertEqual(
+            [r.content_object for r in search.search('zeppelin')],
+            [assignment])
+        properties = [(f.name, unicode(v)) for f, v in assignment.properties]
+        self.assertEqual(properties, [(u'Field 1', u'zeppelin'),
+                                      (u'Field 3', u'choice1')])
+
 
 class AssignmentsTest(BaseTest):
     def test_create(self):
@@ -128,6 +276,162 @@ class AssignmentsTest(BaseTest):
         url = models.Assignment.objects.assignments().all()[0].get_absolute_url()
         self.assertRedirects(response, url)
 
+    def test_unique_slugs(self):
+        slugs = [self.create_assignment(title='Test Article').slug
+                 for i in range(3)]
+        self.assertEqual(slugs, ['test-article', 'test-article-2',
+                                 'test-article-3'])
+        assignment = models.Assignment.objects.get(slug='test-article-2')
+        assignment.title = 'Other'
+        assignment.save()
+        self.assertEqual(assignment.slug, 'other')
+        self.assertEqual(self.create_assignment(title='Test Article').slug,
+                         'test-article-2')
+        # Saving without changing the title keeps the slug.
+        assignment.save()
+        self.assertEqual(assignment.slug, 'other')
+        # Titles with nothing to slugify fall back to the model's name.
+        slugs = [self.create_assignment(title='?!').slug for i in range(2)]
+        self.assertEqual(slugs, ['assignment', 'assignment-2'])
+
+    def test_people_choices(self):
+        choices = forms.people_choices()
+        self.assertEqual(choices, [[u'Test', [
+            (self.superuser.pk, u'Super User'), (self.user.pk, u'Test Er'),
+            (self.user2.pk, u'Test2 Er!')]]])
+        # Changing a profile clears the cached choices.
+        web = models.Section.objects.create(title='Web', slug='web')
+        profile = get_profile(self.user2)
+        profile.section = web
+        profile.save()
+        choices = forms.people_choices()
+        self.assertEqual([title for title, group in choices],
+                         [u'Test', u'Web'])
+        # The user's section is moved to the top, with the user first.
+        choices = forms.people_choices([self.user2.pk])
+        self.assertEqual(choices[0], [u'Web', [(self.user2.pk, u'Test2 Er!')]])
+        choices = forms.people_choices(self.user.pk)
+        self.assertEqual(choices[0][1][0], (self.user.pk, u'Test Er'))
+        # The cached choices aren't changed by the reordering.
+        self.assertEqual(forms.people_choices()[0][1][0][0],
+                         self.superuser.pk)
+        # Logging in saves the user without clearing the cached choices...
+        user = User.objects.get(pk=self.user2.pk)
+        user.last_login = datetime.datetime.now()
+        user.save()
+        self.assertNotEqual(cache.get(people.CACHE_KEY), None)
+        # ...but renaming them does.
+        user.first_name = 'Renamed'
+        user.save()
+        self.assertEqual(cache.get(people.CACHE_KEY), None)
+        self.assertEqual(forms.people_choices()[1],
+                         [u'Web', [(self.user2.pk, u'Renamed Er!')]])
+
+    def test_related_families(self):
+        parent = self.create_assignment('Parent')
+        children = []
+        for title, confirmed in (('b', True), ('a', True), ('c', False)):
+            child = self.create_assignment('Child')
+            child.title, child.parent, child.confirmed = title, parent, confirmed
+            child.save()
+            children.append(child)
+        other = self.create_assignment('Other')
+        related = assignments_views._get_related_families(
+            [parent, children[0], other])
+        titles = lambda bits: [[a.title for a in l] for l in bits]
+        self.assertEqual(titles(related[parent.pk]), [['c'], ['a', 'b']])
+        self.assertEqual(titles(related[children[0].pk]),
+                         [['c'], ['Test Article', 'a']])
+        # Assignments which were passed in are reused.
+        self.assert_(related[children[0].pk][1][0] is parent)
+        self.assertEqual(titles(related[other.pk]), [[], []])
+
+    def test_save_with_new_pk(self):
+        # An assignment with a primary key but no row yet is inserted with
+        # its own counters.
+        assignment = self.create_assignment('Article')
+        assignment.id = assignment.pk + 100
+        assignment.comment_count = 3
+        assignment.save()
+        self.assertEqual(
+            models.Assignment.objects.get(pk=assignment.pk).comment_count, 3)
+
+    def test_activity_counters(self):
+        parent = self.create_assignment('Parent')
+        get = lambda: models.Assignment.objects.get(pk=parent.pk)
+        self.assertEqual(get().last_activity_at, parent.created_at)
+        children = []
+        for confirmed in (True, False, False):
+            child = self.create_assignment('Child')
+            child.parent, child.confirmed = parent, confirmed
+            child.save()
+            children.append(child)
+        comment = models.AssignmentComment.objects.create(
+            assignment=parent, created_by=self.user2, comment='Hi')
+        models.AssignmentComment.objects.create(
+            assignment=parent, created_by=self.user2, comment='Again')
+        status_change = models.StatusHistory.objects.create(
+            assignment=parent, status=self.status_closed, user=self.user)
+        # Saving an out of date instance keeps the counters.
+        parent.save()
+        counters = lambda a: (a.comment_count, a.child_request_count,
+                              a.child_assignment_count)
+        self.assertEqual(counters(get()), (2, 2, 1))
+        self.assertEqual(get().last_activity_at, status_change.date)
+
+        # Accepting a request and deleting things.
+        children[1].confirmed = True
+        children[1].save()
+        children[2].delete()
+        comment.delete()
+        self.assertEqual(counters(get()), (1, 0, 2))
+
+        # Repairing fixes counters which have drifted.
+        models.Assignment.objects.filter(pk=parent.pk).update(
+            comment_count=5, child_request_count=3, last_activity_at=None)
+        self.assertEqual(activity.recalculate(), 1)
+        self.assertEqual(counters(get()), (1, 0, 2))
+        self.assertEqual(get().last_activity_at, status_change.date)
+        self.assertEqual(activity.recalculate(), 0)
+
+    def test_conditional_get(self):
+        assignment = self.create_assignment('Test Article')
+        url = assignment.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, '')
+        # The date alone doesn't tell users and sort orders apart.
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=
+                                   response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        # Other pages have their own ETag.
+        response = self.client.get(reverse('newsroom-requests'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        models.AssignmentComment.objects.create(
+            assignment=assignment, created_by=self.user2, comment='Hi')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Edits which aren't saves of the assignment itself change it too.
+        def assert_changed(etag):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            return response['ETag']
+        etag = response['ETag']
+        self.section.title = 'News'
+        self.section.save()
+        etag = assert_changed(etag)
+        assignment.involved.add(self.user2)
+        etag = assert_changed(etag)
+        assignment.values_changed()
+        assert_changed(etag)
+
     def test_assignment_emails(self):
         add_url = reverse('newsroom-add-assignment', args=[self.category.slug])
 
@@ -135,6 +439,7 @@ class AssignmentsTest(BaseTest):
         data = {'title': 'Test', 'section': '1', 'status': '1',
                 'responsible': self.user.pk, 'involved': [self.user.pk]}
         response = self.client.post(add_url, data)
+        send_queued_mail()
         self.assertEqual(len(mail.outbox), 0)
 
         # Creating assignment sends emails to everyone else involved.
@@ -144,7 +449,12 @@ class AssignmentsTest(BaseTest):
             'involved': [self.user2.pk, self.superuser.pk]
         }
         response = self.client.post(add_url, data)
+        # Emails are only queued in the request.
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(models.QueuedMail.objects.count(), 2)
+        send_queued_mail()
         self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(models.QueuedMail.objects.count(), 0)
 
         # Commenting on an assignment sends notification to everyone else
         # involved.
@@ -152,6 +462,7 @@ class AssignmentsTest(BaseTest):
         data = {'comment': "Here's a comment"}
         mail.outbox = []
         response = self.client.post(assignment.get_absolute_url(), data)
+        send_queued_mail()
         self.assertEqual(len(mail.outbox), 2)
 
         # Updating status history sends notification to others involved.
@@ -159,8 +470,60 @@ class AssignmentsTest(BaseTest):
         data = {'assignment_id': assignment.pk, 'change_status': 'closed'}
         mail.outbox = []
         response = self.client.post(status_url, data)
+        send_queued_mail()
         self.assertEqual(len(mail.outbox), 2)
 
+        # Notifications can be turned off, i.e. for generated data.
+        models.AssignmentComment(assignment=assignment, created_by=self.user,
+                                 comment='Quiet').save(notify=False)
+        models.StatusHistory(assignment=assignment, status=self.status_open,
+                             user=self.user).save(notify=False)
+        self.assertEqual(models.QueuedMail.objects.count(), 0)
+
+    def test_digest_emails(self):
+        profile = get_profile(self.user2)
+        profile.email_digest = True
+        profile.save()
+        assignment = self.create_assignment('Article')
+        assignment.involved.add(self.user2, self.superuser)
+
+        self.client.post(assignment.get_absolute_url(), {'comment': 'One'})
+        self.client.post(assignment.get_absolute_url(), {'comment': 'Two'})
+        send_queued_mail()
+        self.assertEqual([m.to for m in mail.outbox],
+                         [[self.superuser.email], [self.superuser.email]])
+        self.assertEqual(models.DigestEvent.objects.count(), 2)
+
+        mail.outbox = []
+        self.assertEqual(send_digests(), 1)
+        send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user2.email])
+        self.assertEqual(mail.outbox[0].subject,
+                         '2 updates on your assignments')
+        self.assertEqual(models.DigestEvent.objects.count(), 0)
+
+    def test_queued_mail_retry(self):
+        class FailingConnection(ConsoleConnection):
+            def send_messages(self, messages):
+                raise IOError('Connection refused')
+
+        send_mail_from_template(self.user2.email, 'new_assignment',
+                                {'assignment': self.create_assignment('A')})
+        sent, failed = send_queued_mail(connection=FailingConnection())
+        self.assertEqual((sent, failed), (0, 1))
+        queued = models.QueuedMail.objects.get()
+        self.assertEqual(queued.attempts, 1)
+        self.assert_(queued.next_attempt > datetime.datetime.now())
+        self.assertEqual(queued.last_error, 'Connection refused')
+
+        # It isn't retried until the next attempt is due.
+        self.assertEqual(send_queued_mail(), (0, 0))
+        queued.next_attempt = datetime.datetime.now()
+        queued.save()
+        self.assertEqual(send_queued_mail(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
     def test_tab_assignments_count(self):
         tab_text = 'Assignments <span class="number"><span>(</span>%s<span>)'\
                    '</span></span>'
@@ -180,3 +543,427 @@ class AssignmentsTest(BaseTest):
         a1.save()
         response = self.client.get(url)
         self.assertContains(response, tab_text % '1')
+
+        # Membership changes clear the cached count too.
+        a3.involved.add(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, tab_text % '2')
+        a2.involved.remove(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, tab_text % '1')
+
+    def test_workload(self):
+        def rows():
+            return sorted(models.Workload.objects.filter(
+                Q(assignments__gt=0) | Q(requests__gt=0)
+            ).values_list('user', 'section', 'status', 'assignments',
+                          'requests'))
+        a1 = self.create_assignment('Article one')
+        a2 = self.create_assignment('Article two', user=self.user2)
+        request = self.create_assignment('Request')
+        request.confirmed = False
+        request.save()
+        self.user2.assignments_involved.add(a1, request)
+        a2.involved.remove(self.superuser)
+        a1.status = self.status_closed
+        a1.save()
+        request.confirmed = True
+        request.save()
+        a2.involved.clear()
+        self.user.assignments_involved.remove(request)
+        self.assertEqual(workload.get_counts(self.user2),
+                         {'assignments': 1, 'requests': 0})
+        expected = rows()
+        a3 = self.create_assignment('Article three')
+        a3.delete()
+        self.assertEqual(rows(), expected)
+        workload.rebuild()
+        self.assertEqual(rows(), expected)
+
+        editor = get_profile(self.user)
+        editor.is_editor = True
+        editor.save()
+        response = self.client.get(reverse('newsroom-workload'))
+        self.assertEqual([(user, counts) for user, counts, requests
+                          in response.context['workload']],
+                         [(self.user, [0, 1]), (self.user2, [1, 1])])
+
+    def test_sort_by_property(self):
+        field = models.CategoryTextField.objects.create(
+            category=self.category, name='Length', required=False, length=10,
+            sortable=2
+        )
+        assignments = []
+        for value in ['10', '9', '100']:
+            assignment = self.create_assignment('Article')
+            field.values.create(assignment=assignment, value=value)
+            assignments.append(assignment)
+        url = reverse('newsroom-assignments-profile', args=[self.user.username])
+
+        response = self.client.get(url, {'sort1': field.pk})
+        sorted_assignments = list(response.context['sorted_assignments'])
+        a1, a2, a3 = assignments
+        self.assertEqual(sorted_assignments, [a2, a1, a3])
+
+        response = self.client.get(url, {'sort1': field.pk,
+                                         'sort1_reverse': '1'})
+        sorted_assignments = list(response.context['sorted_assignments'])
+        self.assertEqual(sorted_assignments, [a3, a1, a2])
+
+        field.sortable = 1
+        field.save()
+        response = self.client.get(url, {'sort1': field.pk})
+        sorted_assignments = list(response.context['sorted_assignments'])
+        self.assertEqual(sorted_assignments, [a1, a3, a2])
+
+    def test_get_statuses(self):
+        self.create_assignment('Article one')
+        self.create_assignment('Article two', status=self.status_closed)
+        self.create_assignment('Article three', user=self.superuser)
+        t = Template('{% load newsroom_assignments %}'
+                     '{% get_statuses as statuses %}'
+                     '{% for status in statuses %}{{ status.slug }}:'
+                     '{{ status.my_assignments_count }}/'
+                     '{{ status.assignments_count }} {% endfor %}'
+                     '{{ statuses_my_assignments_total }}/'
+                     '{{ statuses_assignments_total }}')
+        output = t.render(Context({'user': self.user}))
+        self.assertEqual(output, 'open:1/2 closed:1/1 2/3')
+
+    def test_list_assignments_cache(self):
+        assignment = self.create_assignment('Article one')
+        t = Template('{% load newsroom_assignments %}'
+                     '{% list_assignments assignments %}')
+
+        def render(compiled):
+            # Load the assignments afresh each time, as a view would.
+            return t.render(Context({
+                'assignments': models.Assignment.objects.all(),
+                'compiled': compiled}))
+
+        output = render(True)
+        self.assert_('<td class="section">Test</td>' in output)
+        # Rows are cached until the assignment is updated.
+        models.Section.objects.filter(pk=self.section.pk).update(title='News')
+        self.assertEqual(render(True), output)
+        self.assert_('>News</a></td>' in render(False))
+        assignment.save()
+        self.assert_('<td class="section">News</td>' in render(True))
+        # Saving a section clears every cached row.
+        section = models.Section.objects.get(pk=self.section.pk)
+        section.title = 'Features'
+        section.save()
+        self.assert_('<td class="section">Features</td>' in render(True))
+        # The time since the assignment was created isn't cached.
+        render(False)
+        created_at = datetime.datetime.now() - datetime.timedelta(hours=3,
+                                                                  minutes=1)
+        models.Assignment.objects.filter(pk=assignment.pk).update(
+            created_at=created_at)
+        self.assert_('(Assigned 3 hours ago)' in render(False))
+
+    def test_assignments_upcoming(self):
+        today = datetime.date.today()
+        for days in [1, 1, 3, 4, 20]:
+            assignment = self.create_assignment('Article')
+            assignment.pub_date = today + datetime.timedelta(days=days)
+            assignment.save()
+        t = Template('{% load newsroom_assignments %}'
+                     '{% assignments_upcoming 2 as days %}'
+                     '{% for day, url, assignments in days %}'
+                     '{{ day|date:"Y-m-d" }}:{{ assignments|length }} '
+                     '{% endfor %}')
+        output = t.render(Context({}))
+        expected = '%s:2 %s:1 ' % (today + datetime.timedelta(days=1),
+                                   today + datetime.timedelta(days=3))
+        self.assertEqual(output, expected)
+
+    def test_calendar_counts(self):
+        today = datetime.date.today()
+        tomorrow = today + datetime.timedelta(days=1)
+        assignment = self.create_assignment('Article')
+        assignment.pub_date = today
+        assignment.save()
+        self.assertEqual(get_assignment_days(today, tomorrow), {today: [1, 0]})
+
+        # The cached counts are invalidated when the status changes...
+        assignment.status = self.status_closed
+        assignment.save()
+        self.assertEqual(get_assignment_days(today, tomorrow), {today: [0, 1]})
+
+        # ...or the pub date changes.
+        assignment.pub_date = tomorrow
+        assignment.save()
+        self.assertEqual(get_assignment_days(today, tomorrow),
+                         {tomorrow: [0, 1]})
+
+        assignment.delete()
+        self.assertEqual(get_assignment_days(today, tomorrow), {})
+
+    def test_mass_mail_from_template(self):
+        templates = get_mail_templates('new_assignment')
+        self.assert_(get_mail_templates('new_assignment')[1] is templates[1])
+        assignment = self.create_assignment('Article')
+        recipients = [(user.email, {'assignment': assignment, 'user': user})
+                      for user in [self.user2, self.superuser]]
+        send_mass_mail_from_template('new_assignment', recipients, queue=False)
+        self.assertEqual([m.to for m in mail.outbox],
+                         [[self.user2.email], [self.superuser.email]])
+        self.assertEqual(mail.outbox[0].subject,
+                         "You've been assigned to %s" % assignment)
+
+
+class CheckIndexesTest(NewsroomFixtures, TransactionTestCase):
+    # The command runs EXPLAIN and ANALYZE outside of the ORM, which commits
+    # the open transaction with some backends (i.e. SQLite), so the test
+    # can't run inside a rolled back transaction.
+    def tearDown(self):
+        # Don't leave the committed rows to the tests which run next.
+        call_command('flush', verbosity=0, interactive=False)
+
+    def test_check_indexes(self):
+        assignment = self.create_assignment('Article')
+        assignment.pub_date = datetime.date.today()
+        assignment.save()
+        # The plans of a tiny database aren't meaningful, but every query
+        # should be explained and reported.
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            call_command('newsroom_check_indexes', verbosity=2)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        reported = re.findall(r'^([\w.]+(?: \([\w ]+\))?): '
+                              r'(?:ok|sequential scan of .+)$', output, re.M)
+        self.assert_('assignments.listing_day' in reported, output)
+        self.assert_('assignments.assignment_detail (comments)' in reported,
+                     output)
+        self.assert_(re.search(r'^\d+ sequential scans? found\.$', output,
+                               re.M), output)
+
+
+class SearchTest(BaseTest):
+    def test_search(self):
+        blotter = self.create_assignment('Blotter')
+        blotter.title = 'Police blotter'
+        blotter.save()
+        recap = self.create_assignment('Recap')
+        recap.title = 'Game recap'
+        recap.save()
+        models.AssignmentComment.objects.create(
+            assignment=recap, created_by=self.user2,
+            comment='The police closed the road to the stadium.'
+        )
+
+        results = search.search('police')
+        self.assertEqual([r.content_object for r in results][0], blotter)
+        self.assertEqual(len(results), 2)
+        # Prefix matching.
+        self.assertEqual([r.content_object for r in search.search('blott')],
+                         [blotter])
+        # All words must match.
+        self.assertEqual([r.title for r in search.search('police stad')],
+                         [u'Comment on Game recap'])
+        self.assertEqual(search.search('police weather'), [])
+
+        # The index is kept up to date.
+        blotter.title = 'Crime report'
+        blotter.save()
+        self.assertEqual([r.content_object for r in search.search('crime')],
+                         [blotter])
+        self.assertEqual(len(search.search('police')), 1)
+        blotter.delete()
+        self.assertEqual(search.search('crime'), [])
+
+        response = self.client.get(reverse('newsroom-search'),
+                                   {'q': 'recap'})
+        self.assertContains(response, 'Game recap')
+
+
+class ApiTest(BaseTest):
+    def test_assignments(self):
+        undated = self.create_assignment('Undated')
+        dated = []
+        for day in (3, 1, 1):
+            assignment = self.create_assignment('Dated')
+            assignment.pub_date = datetime.date(2010, 1, day)
+            assignment.save()
+            dated.append(assignment)
+        request = self.create_assignment('Request')
+        models.Assignment.objects.filter(pk=request.pk).update(confirmed=False)
+        url = reverse('newsroom-api-assignments')
+
+        ids = []
+        data = {'limit': 2, 'fields': 'id,title,involved'}
+        while True:
+            response = self.client.get(url, data)
+            self.assertEqual(response['Content-Type'],
+                             'application/json; charset=utf-8')
+            page = simplejson.loads(response.content)
+            ids.extend([item['id'] for item in page['objects']])
+            if not page['next']:
+                break
+            data['after'] = page['next']
+        self.assertEqual(ids, [undated.pk, dated[1].pk, dated[2].pk,
+                               dated[0].pk])
+        item = page['objects'][-1]
+        self.assertEqual(item, {'id': dated[0].pk, 'title': 'Test Article',
+                                'involved': ['tester']})
+
+        response = self.client.get(url, {'updated_since': '2100-01-01'})
+        self.assertEqual(simplejson.loads(response.content)['objects'], [])
+        response = self.client.get(url, {'fields': 'id,nothing'})
+        self.assertEqual(response.status_code, 400)
+
+        url = reverse('newsroom-api-requests')
+        response = self.client.get(url, {'fields': 'id,confirmed'})
+        self.assertEqual(simplejson.loads(response.content)['objects'],
+                         [{'id': request.pk, 'confirmed': False}])
+
+    def test_categories(self):
+        f = models.CategoryChoiceField.objects.create(
+            category=self.category, name='Length', required=True
+        )
+        f.choices.create(option='Short')
+        response = self.client.get(reverse('newsroom-api-categories'))
+        category = simplejson.loads(response.content)['objects'][0]
+        self.assertEqual(category['slug'], 'story')
+        self.assertEqual([(field['name'], field['choices'])
+                          for field in category['fields']],
+                         [('Length', ['Short'])])
+
+    def test_changes(self):
+        assignment = self.create_assignment('Story')
+        comment = models.AssignmentComment.objects.create(
+            assignment=assignment, created_by=self.user2, comment='Hi')
+        url = reverse('newsroom-api-changes')
+        lines = [simplejson.loads(line)
+                 for line in self.client.get(url).content.splitlines()]
+        self.assertEqual([(c['type'], c['action'], c['object_id'])
+                          for c in lines[:-1]],
+                         [('assignment', 'create', assignment.pk),
+                          ('assignmentcomment', 'create', comment.pk)])
+        self.assertEqual(lines[0]['object']['title'], 'Test Article')
+        self.assertEqual(lines[1]['object']['comment'], 'Hi')
+        cursor = lines[-1]['cursor']
+        self.assertEqual(lines[-1]['more'], False)
+
+        comment.delete()
+        lines = [simplejson.loads(line) for line in
+                 self.client.get(url, {'since': cursor}).content.splitlines()]
+        self.assertEqual([(c['type'], c['action'], c['object'])
+                          for c in lines[:-1]],
+                         [('assignmentcomment', 'delete', None)])
+
+
+class QueryBudgetTest(BudgetTest):
+    BUDGETS = {
+        'newsroom-assignments': 40,
+        'newsroom-assignments-day': 40,
+        'newsroom-assignments-day-compiled': 40,
+        'newsroom-assignments-profile': 40,
+        'newsroom-assignment': 30,
+        'newsroom-requests': 40,
+        'newsroom-person': 40,
+        'newsroom-api-assignments': 15,
+    }
+
+    def setUp(self):
+        super(QueryBudgetTest, self).setUp()
+        self.field = models.CategoryTextField.objects.create(
+            category=self.category, name='Length', required=False, length=10)
+        self.tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        self.root = None
+
+    def get_url(self, name):
+        day = [self.tomorrow.year, '%02d' % self.tomorrow.month,
+               '%02d' % self.tomorrow.day]
+        if name in ('newsroom-assignments-day',
+                    'newsroom-assignments-day-compiled'):
+            return reverse(name, args=day)
+        if name in ('newsroom-assignments-profile', 'newsroom-person'):
+            return reverse(name, args=['tester'])
+        if name == 'newsroom-assignment':
+            return self.root.get_absolute_url()
+        return reverse(name)
+
+    def create_rows(self, count):
+        """
+        Create pairs of an assignment and a request for tomorrow, involving
+        the logged in user. Every other request belongs to the first
+        assignment, so that its family grows with the data too.
+        """
+        for i in range(count // 2):
+            assignment = self.create_assignment('Budget', user=self.user2)
+            assignment.pub_date = self.tomorrow
+            assignment.save()
+            assignment.involved.add(self.user)
+            self.field.values.create(assignment=assignment, value='%s' % i)
+            if self.root is None:
+                self.root = assignment
+            request = self.create_assignment('Budget request')
+            request.pub_date = self.tomorrow
+            request.parent = i % 2 and self.root or assignment
+            request.confirmed = False
+            request.save()
+            self.field.values.create(assignment=request, value='%s' % i)
+
+    def test_budgets(self):
+        self.assertBudgets()
+
+
+class InstrumentationTest(BaseTest):
+    def test_percentile(self):
+        values = range(1, 11)
+        self.assertEqual(instrumentation.percentile(values, 0.5), 5)
+        self.assertEqual(instrumentation.percentile(values, 0.9), 9)
+        self.assertEqual(instrumentation.percentile(values, 0.99), 10)
+        self.assertEqual(instrumentation.percentile([], 0.5), None)
+
+    def test_record(self):
+        old_samples = getattr(settings, 'NEWSROOM_INSTRUMENTATION_SAMPLES',
+                              200)
+        settings.NEWSROOM_INSTRUMENTATION_SAMPLES = 2
+        try:
+            for queries in (1, 2, 3):
+                data = dict([(name, 0.0) for name in instrumentation.TIMINGS],
+                            queries=queries, tags={})
+                instrumentation.record('test-view', data)
+            summary = instrumentation.get_summary()
+        finally:
+            settings.NEWSROOM_INSTRUMENTATION_SAMPLES = old_samples
+        # Only the latest samples are kept.
+        self.assertEqual([(row['count'], row['queries_p99'])
+                          for row in summary if row['view'] == 'test-view'],
+                         [(2, 3)])
+
+    def test_middleware(self):
+        old_settings = (getattr(settings, 'NEWSROOM_INSTRUMENTATION', False),
+                        settings.DEBUG)
+        settings.NEWSROOM_INSTRUMENTATION = settings.DEBUG = True
+        try:
+            middleware = instrumentation.InstrumentationMiddleware()
+            request = HttpRequest()
+            request.method = 'GET'
+            request.path = request.path_info = reverse('newsroom-assignments')
+            middleware.process_request(request)
+            middleware.process_view(request, assignments_views.listing, (),
+                                    {})
+            list(models.Section.objects.all())
+            response = middleware.process_response(request, HttpResponse())
+        finally:
+            settings.NEWSROOM_INSTRUMENTATION, settings.DEBUG = old_settings
+        self.assertEqual(response['X-Newsroom-Queries'], '1')
+        summary = instrumentation.get_summary()
+        self.assertEqual([(row['view'], row['count'], row['queries_p50'])
+                          for row in summary],
+                         [(response['X-Newsroom-View'], 1, 1)])
+        # Only editors can see the statistics.
+        response = self.client.get(reverse('newsroom-stats'))
+        self.assertEqual(response.status_code, 302)
+        profile = get_profile(self.user)
+        profile.is_editor = True
+        profile.save()
+        response = self.client.get(reverse('newsroom-stats'))
+        self.assertContains(response, summary[0]['view'])
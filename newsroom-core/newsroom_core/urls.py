@@ -49,6 +49,19 @@ urlpatterns = patterns('newsroom_core.views',
     url(r'^profile/([\w-]+)/edit/$', 'people.edit_profile',
         name='newsroom-edit-profile'),
 
+    url(r'^search/$', 'search.search', name='newsroom-search'),
+    url(r'^stats/$', 'stats.stats', name='newsroom-stats'),
+    url(r'^workload/$', 'people.workload', name='newsroom-workload'),
+
+    url(r'^api/assignments/$', 'api.assignments',
+        name='newsroom-api-assignments'),
+    url(r'^api/requests/$', 'api.requests', name='newsroom-api-requests'),
+    url(r'^api/statuses/$', 'api.statuses', name='newsroom-api-statuses'),
+    url(r'^api/sections/$', 'api.sections', name='newsroom-api-sections'),
+    url(r'^api/categories/$', 'api.categories',
+        name='newsroom-api-categories'),
+    url(r'^api/changes/$', 'api.changes', name='newsroom-api-changes'),
+
     url(r'^login/$', 'core.login', name='newsroom-login'),
 )
 
@@ -0,0 +1,164 @@
+"""
+Denormalized activity counters of assignments: the number of comments, child
+requests and child assignments, and the date of the latest activity (the
+latest comment, status change or child, or the creation of the assignment).
+
+They are stored on ``Assignment`` so that listings can show them and sort by
+them without extra queries. The signal handlers here keep them up to date
+with single ``UPDATE`` statements which add to the stored counts in the
+database (rather than saving counts calculated in Python), so concurrent
+changes can't overwrite each other and the counters are changed in the same
+transaction as the object which changed them. Saving an assignment leaves
+them out (see ``exclude_from_save``).
+
+``recalculate`` (used by the ``newsroom_repair_activity`` management command)
+calculates the counters from scratch, for databases which were filled before
+the counters existed or have drifted.
+"""
+from django.db.models import Count, F, Max, Q
+
+COUNTERS = ('comment_count', 'child_request_count', 'child_assignment_count')
+FIELDS = COUNTERS + ('last_activity_at',)
+
+
+def _child_counter(confirmed):
+    return confirmed and 'child_assignment_count' or 'child_request_count'
+
+
+def update_counters(assignment_id, date=None, **changes):
+    """
+    Add to the counters of an assignment (i.e. ``comment_count=1``) and move
+    its latest activity forward to ``date`` (if it is later).
+    """
+    from newsroom_core import models
+    assignments = models.Assignment.objects.filter(pk=assignment_id)
+    changes = dict([(name, F(name) + value)
+                    for name, value in changes.items() if value])
+    if changes:
+        assignments.update(**changes)
+    if date is not None:
+        assignments.filter(Q(last_activity_at__lt=date) |
+                           Q(last_activity_at__isnull=True))\
+                   .update(last_activity_at=date)
+
+
+def exclude_from_save(assignment):
+    """
+    Set the activity fields of an assignment to expressions which leave the
+    stored values as they are when it is saved. Returns the loaded values, to
+    be put back with ``restore`` after saving.
+    """
+    loaded = {}
+    for name in FIELDS:
+        loaded[name] = getattr(assignment, name)
+        setattr(assignment, name, F(name))
+    return loaded
+
+
+def restore(assignment, loaded):
+    for name, value in loaded.items():
+        setattr(assignment, name, value)
+
+
+def recalculate(assignment_ids=None, batch_size=500):
+    """
+    Calculate the counters from scratch for a list of assignment ids (or all
+    assignments), a batch at a time. Returns the number of assignments whose
+    counters were wrong.
+    """
+    from newsroom_core import models
+    if assignment_ids is None:
+        assignment_ids = models.Assignment.objects.order_by('pk')\
+                                                  .values_list('pk', flat=True)
+    assignment_ids = list(assignment_ids)
+    fixed = 0
+    for start in range(0, len(assignment_ids), batch_size):
+        fixed += _recalculate_batch(assignment_ids[start:start + batch_size])
+    return fixed
+
+
+def _recalculate_batch(assignment_ids):
+    from newsroom_core import models
+    assignments = models.Assignment.objects.filter(pk__in=assignment_ids)
+    current = dict([(row['pk'], row) for row in assignments.values(
+        'pk', 'created_at', 'last_activity_at', *COUNTERS)])
+    data = {}
+    for pk, row in current.items():
+        data[pk] = dict([(name, 0) for name in COUNTERS],
+                        last_activity_at=row['created_at'])
+
+    def add(rows, key, counter=None):
+        for row in rows:
+            values = data[row[key]]
+            if counter:
+                values[counter] += row['count']
+            if row['latest'] and row['latest'] > values['last_activity_at']:
+                values['last_activity_at'] = row['latest']
+
+    add(models.AssignmentComment.objects
+            .filter(assignment__in=assignment_ids).order_by()
+            .values('assignment')
+            .annotate(count=Count('pk'), latest=Max('created_at')),
+        'assignment', 'comment_count')
+    add(models.StatusHistory.objects
+            .filter(assignment__in=assignment_ids).order_by()
+            .values('assignment')
+            .annotate(count=Count('pk'), latest=Max('date')),
+        'assignment')
+    for confirmed in (True, False):
+        add(models.Assignment.objects
+                .filter(parent__in=assignment_ids, confirmed=confirmed)
+                .order_by().values('parent')
+                .annotate(count=Count('pk'), latest=Max('created_at')),
+            'parent', _child_counter(confirmed))
+
+    fixed = 0
+    for pk, values in data.items():
+        row = current[pk]
+        if [name for name in values if values[name] != row[name]]:
+            models.Assignment.objects.filter(pk=pk).update(**values)
+            fixed += 1
+    return fixed
+
+
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        update_counters(instance.assignment_id, instance.created_at,
+                        comment_count=1)
+
+
+def comment_deleted(sender, instance, **kwargs):
+    update_counters(instance.assignment_id, comment_count=-1)
+
+
+def status_change_saved(sender, instance, created, **kwargs):
+    if created:
+        update_counters(instance.assignment_id, instance.date)
+
+
+def assignment_saved(sender, instance, created, **kwargs):
+    if created:
+        if instance.parent_id:
+            update_counters(instance.parent_id, instance.created_at,
+                            **{_child_counter(instance.confirmed): 1})
+        return
+    changed = instance.changed_fields()
+    if 'parent_id' not in changed and 'confirmed' not in changed:
+        return
+    # Take the child away from its old counter (and parent) and add it to the
+    # new one, i.e. when a request is accepted.
+    original = instance._original
+    if original['parent_id']:
+        update_counters(original['parent_id'],
+                        **{_child_counter(original['confirmed']): -1})
+    if instance.parent_id:
+        update_counters(instance.parent_id, instance.updated_on,
+                        **{_child_counter(instance.confirmed): 1})
+
+
+def assignment_deleted(sender, instance, **kwargs):
+    # Use the values saved in the database.
+    original = instance._original
+    if original['parent_id']:
+        update_counters(original['parent_id'],
+                        **{_child_counter(original['confirmed']): -1})
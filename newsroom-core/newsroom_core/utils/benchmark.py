@@ -0,0 +1,91 @@
+"""
+Helpers for measuring how long something takes and which database queries it
+makes, used by the ``newsroom_benchmark`` management command and the query
+budget tests.
+"""
+import difflib
+import re
+import time
+from django.conf import settings
+from django.db import connection
+
+
+def measure(func, *args, **kwargs):
+    """
+    Call a function, returning a tuple of its result, the time it took (in
+    seconds) and the list of SQL statements it executed.
+
+    ``DEBUG`` is turned on while the function runs so that Django records the
+    queries.
+    """
+    old_debug = settings.DEBUG
+    settings.DEBUG = True
+    connection.queries = []
+    try:
+        start = time.time()
+        result = func(*args, **kwargs)
+        elapsed = time.time() - start
+        queries = [query['sql'] for query in connection.queries]
+    finally:
+        settings.DEBUG = old_debug
+        connection.queries = []
+    return result, elapsed, queries
+
+
+def reset_caches():
+    """
+    Clear the newsroom's own caches, so that pages are measured uncached
+    without flushing the whole cache backend (which may be shared): the
+    category schema kept by each process, the people choices, the calendar
+    and user counts and the rendered listing rows.
+    """
+    from django.contrib.auth.models import User
+    from newsroom_core.utils import calendar, counts, people, rows, schema
+    schema.invalidate()
+    people.invalidate()
+    calendar.invalidate_calendar()
+    user_ids = User.objects.values_list('pk', flat=True)
+    counts.invalidate_user_counts(list(user_ids))
+    rows.invalidate()
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def normalize_sql(sql):
+    """
+    Replace the literal values in an SQL statement, so that the same query
+    made for different objects compares equal.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", "'?'", sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \((?:\?, )*\?\)', 'IN (...)', sql)
+
+
+def diff_queries(expected, actual):
+    """
+    Returns a list of lines describing how the ``actual`` list of SQL
+    statements differs from the ``expected`` one: a unified diff of the
+    normalized statements, followed by the statements made more than once
+    (which usually point at a query made once per object).
+    """
+    expected = [normalize_sql(sql) for sql in expected]
+    actual = [normalize_sql(sql) for sql in actual]
+    lines = list(difflib.unified_diff(expected, actual, 'expected', 'actual',
+                                      n=0, lineterm=''))
+    repeated = {}
+    for sql in actual:
+        repeated[sql] = repeated.get(sql, 0) + 1
+    repeated = [(count, sql) for sql, count in repeated.items() if count > 1]
+    if repeated:
+        lines.append('Repeated queries:')
+        for count, sql in sorted(repeated, reverse=True):
+            lines.append('%5d x %s' % (count, sql))
+    return lines
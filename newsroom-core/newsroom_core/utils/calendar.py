@@ -1,5 +1,10 @@
 import datetime
+from django.conf import settings
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db.models import Count
+
+GENERATION_KEY = 'newsroom-calendar-generation'
 
 
 def build_calendar(days=30):
@@ -17,4 +22,91 @@ def build_calendar(days=30):
 
 def assignment_day_url(day):
     args = [day.year, '%02d' % day.month, '%02d' % day.day]
-    return reverse('newsroom-assignments-day', args=args)
\ No newline at end of file
+    return reverse('newsroom-assignments-day', args=args)
+
+
+def count_assignment_days(assignments):
+    """
+    Returns a dictionary mapping days to a list of the count of unfinished
+    and finished assignments, using a single aggregate query.
+    """
+    counts = assignments.order_by().values('pub_date',
+                                           'status__means_completed')
+    counts = counts.annotate(count=Count('pk'))
+    days = {}
+    for row in counts:
+        day = days.setdefault(row['pub_date'], [0, 0])
+        day[row['status__means_completed'] and 1 or 0] += row['count']
+    return days
+
+
+def get_assignment_days(first_day, last_day):
+    """
+    Returns a dictionary mapping days (between ``first_day`` and ``last_day``
+    inclusive) to a list of the count of unfinished and finished assignments.
+
+    The counts for each month are cached until an assignment in that month
+    changes.
+    """
+    months = []
+    year, month = first_day.year, first_day.month
+    while (year, month) <= (last_day.year, last_day.month):
+        months.append((year, month))
+        year, month = month == 12 and (year + 1, 1) or (year, month + 1)
+    generation = _get_generation()
+    keys = dict([(_month_key(year, month, generation), (year, month))
+                 for year, month in months])
+    cached = cache.get_many(keys.keys())
+    timeout = getattr(settings, 'NEWSROOM_CALENDAR_CACHE_TIMEOUT', 60 * 60)
+    days = {}
+    for key, (year, month) in keys.items():
+        month_counts = cached.get(key)
+        if month_counts is None:
+            month_counts = _count_month(year, month)
+            cache.set(key, month_counts, timeout)
+        for day, counts in month_counts.items():
+            if first_day <= day <= last_day:
+                days[day] = counts
+    return days
+
+
+def invalidate_assignment_day(day):
+    """
+    Clear the cached calendar counts for the month containing ``day``.
+    """
+    if day:
+        cache.delete(_month_key(day.year, day.month, _get_generation()))
+
+
+def invalidate_calendar(**kwargs):
+    """
+    Clear all cached calendar counts. The keyword arguments are ignored so
+    that this can be connected directly to model signals.
+    """
+    cache.set(GENERATION_KEY, _new_generation())
+
+
+def _count_month(year, month):
+    from newsroom_core import models
+    first_day = datetime.date(year, month, 1)
+    next_month = first_day + datetime.timedelta(days=31)
+    next_month = datetime.date(next_month.year, next_month.month, 1)
+    assignments = models.Assignment.objects.assignments().filter(
+                        pub_date__gte=first_day, pub_date__lt=next_month)
+    return count_assignment_days(assignments)
+
+
+def _month_key(year, month, generation):
+    return 'newsroom-calendar-%s-%04d-%02d' % (generation, year, month)
+
+
+def _get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = _new_generation()
+        cache.set(GENERATION_KEY, generation)
+    return generation
+
+
+def _new_generation():
+    return datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
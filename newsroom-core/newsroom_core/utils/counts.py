@@ -0,0 +1,46 @@
+"""
+Per-user counts of the assignments and requests a user is involved in, as
+shown in the newsroom tabs. They are read from the workload summary table
+(see ``newsroom_core.utils.workload``).
+
+The counts are cached for a short time (``NEWSROOM_USER_COUNTS_TIMEOUT``
+seconds, one minute by default) and cleared whenever an assignment the user
+is involved in changes status or confirmation, or the people involved in an
+assignment change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_user_counts(user, request=None):
+    """
+    Returns a dictionary containing the ``assignments`` (unfinished) and
+    ``requests`` counts for a user.
+
+    If a request is provided, the counts are also remembered for the rest of
+    that request.
+    """
+    if request is not None and hasattr(request, '_newsroom_user_counts'):
+        return request._newsroom_user_counts
+    key = _key(user.pk)
+    counts = cache.get(key)
+    if counts is None:
+        from newsroom_core.utils import workload
+        counts = workload.get_counts(user)
+        timeout = getattr(settings, 'NEWSROOM_USER_COUNTS_TIMEOUT', 60)
+        cache.set(key, counts, timeout)
+    if request is not None:
+        request._newsroom_user_counts = counts
+    return counts
+
+
+def invalidate_user_counts(user_ids):
+    """
+    Clear the cached counts for a list of user ids.
+    """
+    if user_ids:
+        cache.delete_many([_key(pk) for pk in user_ids])
+
+
+def _key(user_id):
+    return 'newsroom-user-counts-%s' % user_id
@@ -1,5 +1,10 @@
+import datetime
+import os
 import re
+import sys
 
+from django.conf import settings
+from django.core import mail
 from django.core.mail import EmailMessage
 from django.template import Context
 from django.template.loader import find_template_source, get_template_from_string
@@ -7,27 +12,255 @@ from django.contrib.sites.models import Site
 
 RE_SUBJECT = re.compile(r'SUBJECT:\s*(.+)')
 
+# Minutes to wait before retrying a failed message, by number of attempts.
+RETRY_DELAYS = [1, 5, 15, 60, 60 * 3, 60 * 6, 60 * 12]
 
-def send_mail_from_template(to, template_name, context=None, fail_silently=True):
-    if not to:
-        return
-    # Build the context
-    context = context or {}
-    context['site'] = Site.objects.get_current()
-    context = Context(context, autoescape=False)
-    # Get the text email body
+
+_templates = {}
+
+
+def get_mail_templates(template_name):
+    """
+    Returns a tuple of the compiled subject and body templates for an email
+    template.
+
+    The compiled templates are kept for the life of the process. When
+    ``DEBUG`` is on, the template source is checked on every call and the
+    templates are recompiled if it has changed.
+    """
+    cached = _templates.get(template_name)
+    if cached and not settings.DEBUG:
+        return cached[1:]
     source, origin = find_template_source('newsroom/emails/%s.txt' % template_name)
+    if cached and cached[0] == source:
+        return cached[1:]
     template = get_template_from_string(source, origin, template_name)
-    body = template.render(context)
     # Get the subject line
     match = RE_SUBJECT.search(source)
     if not match:
         raise ValueError('The email source did not contain a "SUBJECT:" line')
     subject_source = match.group(1)
-    template = get_template_from_string(subject_source, origin, template_name)
-    subject = template.render(context)
-    # Fire off the email
+    subject_template = get_template_from_string(subject_source, origin,
+                                                template_name)
+    _templates[template_name] = (source, subject_template, template)
+    return subject_template, template
+
+
+def render_mail_from_template(template_name, context=None, site=None):
+    """
+    Returns a tuple of the rendered subject and body of an email template.
+    """
+    subject_template, body_template = get_mail_templates(template_name)
+    # Build the context
+    context = context or {}
+    context['site'] = site or Site.objects.get_current()
+    context = Context(context, autoescape=False)
+    body = body_template.render(context)
+    subject = subject_template.render(context)
+    return subject, body
+
+
+def send_mail_from_template(to, template_name, context=None, fail_silently=True,
+                            queue=None):
+    """
+    Render an email template and send it.
+
+    Unless ``queue`` is ``False`` (or the ``NEWSROOM_MAIL_QUEUE`` setting is
+    ``False``), the message is only added to the outbox to be sent by the
+    ``newsroom_send_mail`` management command.
+    """
+    if not to:
+        return
     if isinstance(to, basestring):
         to = [to]
-    msg = EmailMessage(subject, body, to=to)
-    msg.send(fail_silently=fail_silently)
+    send_mass_mail_from_template(template_name, [(to, context)],
+                                 fail_silently=fail_silently, queue=queue)
+
+
+def send_mass_mail_from_template(template_name, recipients, fail_silently=True,
+                                 queue=None):
+    """
+    Render an email template for a number of recipients and send the
+    messages.
+
+    ``recipients`` is a list of ``(to, context)`` tuples, where ``to`` is an
+    email address or list of addresses. The template is only compiled once,
+    and the messages are sent over a single connection if they aren't queued
+    (see ``send_mail_from_template``).
+    """
+    if queue is None:
+        queue = getattr(settings, 'NEWSROOM_MAIL_QUEUE', True)
+    site = Site.objects.get_current()
+    messages = []
+    for to, context in recipients:
+        if not to:
+            continue
+        if isinstance(to, basestring):
+            to = [to]
+        subject, body = render_mail_from_template(template_name, context,
+                                                  site=site)
+        messages.append((to, subject, body))
+    if not messages:
+        return
+    if queue:
+        from newsroom_core import models
+        for to, subject, body in messages:
+            for address in to:
+                models.QueuedMail.objects.create(to=address, subject=subject,
+                                                 body=body)
+        return
+    # Fire off the emails
+    connection = mail.get_connection(fail_silently=fail_silently)
+    connection.send_messages([EmailMessage(subject, body, to=to)
+                              for to, subject, body in messages])
+
+
+def send_queued_mail(batch_size=100, connection=None, max_attempts=None):
+    """
+    Send the messages in the outbox which are due, in batches over a single
+    connection.
+
+    Sent messages are removed from the outbox. Messages which fail are retried
+    later with an increasing delay, up to ``max_attempts`` times (defaulting to
+    the ``NEWSROOM_MAIL_MAX_ATTEMPTS`` setting, or 10).
+
+    Returns a tuple of the number of messages sent and the number which
+    failed.
+    """
+    from newsroom_core import models
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'NEWSROOM_MAIL_MAX_ATTEMPTS', 10)
+    connection = connection or get_mail_connection()
+    sent = failed = 0
+    connection.open()
+    try:
+        while True:
+            now = datetime.datetime.now()
+            batch = models.QueuedMail.objects.filter(
+                next_attempt__lte=now, attempts__lt=max_attempts
+            ).order_by('next_attempt')[:batch_size]
+            batch = list(batch)
+            if not batch:
+                break
+            for queued in batch:
+                # Claim the message so that a concurrent worker doesn't send it
+                # too.
+                locked_until = now + datetime.timedelta(minutes=10)
+                claimed = models.QueuedMail.objects.filter(
+                    pk=queued.pk, next_attempt=queued.next_attempt
+                ).update(next_attempt=locked_until)
+                if not claimed:
+                    continue
+                message = EmailMessage(queued.subject, queued.body,
+                                       to=[queued.to])
+                try:
+                    connection.send_messages([message])
+                except Exception as e:
+                    queued.attempts += 1
+                    delay = RETRY_DELAYS[min(queued.attempts,
+                                             len(RETRY_DELAYS)) - 1]
+                    queued.next_attempt = (datetime.datetime.now() +
+                                           datetime.timedelta(minutes=delay))
+                    queued.last_error = unicode(e)
+                    queued.save()
+                    failed += 1
+                else:
+                    queued.delete()
+                    sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def send_digests():
+    """
+    Send each user who prefers a digest a single email of the comments and
+    status changes on their assignments since their last digest.
+
+    Returns the number of digests sent (or queued).
+    """
+    from newsroom_core import models
+    now = datetime.datetime.now()
+    events = models.DigestEvent.objects.filter(created_at__lte=now)
+    events = events.select_related('user', 'assignment', 'comment',
+                                   'status_change', 'status_change__status')
+    events = events.order_by('user', 'created_at')
+    users = []
+    for event in events:
+        if not users or users[-1][0].pk != event.user_id:
+            users.append((event.user, [], {}))
+        user, user_events, by_assignment = users[-1]
+        user_events.append(event)
+        if event.assignment_id not in by_assignment:
+            by_assignment[event.assignment_id] = (event.assignment, [])
+        by_assignment[event.assignment_id][1].append(event)
+    recipients = []
+    event_ids = []
+    for user, user_events, by_assignment in users:
+        assignments = sorted(by_assignment.values(),
+                             key=lambda bits: bits[1][0].created_at)
+        c = {'user': user, 'events': user_events, 'assignments': assignments}
+        recipients.append((user.email, c))
+        event_ids.extend([event.pk for event in user_events])
+    send_mass_mail_from_template('digest', recipients)
+    if event_ids:
+        models.DigestEvent.objects.filter(pk__in=event_ids).delete()
+    return len(recipients)
+
+
+def get_mail_connection():
+    """
+    Returns a connection for sending mail, as set by the
+    ``NEWSROOM_MAIL_BACKEND`` setting: ``'console'``, ``'file'`` (writing to
+    the ``NEWSROOM_MAIL_FILE_PATH`` directory) or, by default, Django's
+    ``EMAIL_BACKEND``.
+    """
+    backend = getattr(settings, 'NEWSROOM_MAIL_BACKEND', 'smtp')
+    if backend == 'console':
+        return ConsoleConnection()
+    if backend == 'file':
+        return FileConnection()
+    return mail.get_connection(fail_silently=False)
+
+
+class ConsoleConnection(object):
+    """
+    A mail connection which writes messages to a stream (standard output by
+    default) rather than sending them.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            self.stream.write('%s\n%s\n' % (message.message().as_string(),
+                                            '-' * 79))
+        return len(messages)
+
+
+class FileConnection(ConsoleConnection):
+    """
+    A mail connection which writes the messages of each session to a new file
+    in a directory.
+    """
+    def __init__(self, path=None):
+        self.path = path or settings.NEWSROOM_MAIL_FILE_PATH
+        self.stream = None
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        filename = '%s-%s.log' % (
+            datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), os.getpid())
+        self.stream = open(os.path.join(self.path, filename), 'a')
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
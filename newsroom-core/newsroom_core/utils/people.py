@@ -0,0 +1,67 @@
+"""
+The grouped choices of newsroom people used by the assignment forms.
+
+Listing everyone by section takes a query joining every profile to its user
+and section, so the grouped choices are built once and kept in Django's cache
+until a profile or section is saved or deleted, or a user is renamed or
+deleted (users are saved on every login). Moving the current user's section
+(and the user) to the top is done on a copy of the cached choices.
+"""
+from django.core.cache import cache
+
+CACHE_KEY = 'newsroom-people-choices'
+
+
+def _load():
+    from newsroom_core import models
+    groups = []
+    section_id = None
+    profiles = models.NewsroomProfile.objects.select_related().order_by(
+        'section__title', 'user__first_name', 'user__last_name'
+    )
+    for profile in profiles:
+        if profile.section_id != section_id:
+            section_id = profile.section_id
+            groups.append((section_id, unicode(profile.section), []))
+        groups[-1][2].append((profile.user_id, unicode(profile)))
+    return groups
+
+
+def get_people_groups():
+    """
+    Returns a list of ``(section_id, section_title, people)`` tuples, where
+    ``people`` is a list of ``(user_id, name)`` tuples.
+    """
+    groups = cache.get(CACHE_KEY)
+    if groups is None:
+        groups = _load()
+        cache.set(CACHE_KEY, groups)
+    return groups
+
+
+def get_people_choices(user_id=None):
+    """
+    Returns the people grouped by section, suitable for a form field's
+    ``choices``.
+
+    If ``user_id`` is given, that user's section is moved to the top with the
+    user first.
+    """
+    choices = []
+    for section_id, title, people in get_people_groups():
+        people = list(people)
+        user_choice = [c for c in people if user_id and c[0] == user_id]
+        if user_choice:
+            people.remove(user_choice[0])
+            choices.insert(0, [title, user_choice + people])
+        else:
+            choices.append([title, people])
+    return choices
+
+
+def invalidate(**kwargs):
+    """
+    Clear the cached choices. The keyword arguments are ignored so that this
+    can be connected directly to model signals.
+    """
+    cache.delete(CACHE_KEY)
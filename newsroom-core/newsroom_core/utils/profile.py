@@ -13,3 +13,25 @@ def get_profile(user):
     except AttributeError:
         # Most likely we're dealing with an AnonymousUser
         return models.NewsroomProfile()
+
+
+def load_profiles(users):
+    """
+    Fill the newsroom profile cache of a list of users with a single query.
+    The list may hold several objects for the same user (i.e. the creators
+    of different comments), which then share the profile.
+    """
+    by_pk = {}
+    for user in users:
+        if user is not None:
+            by_pk.setdefault(user.pk, []).append(user)
+    if not by_pk:
+        return
+    user_field = models.NewsroomProfile._meta.get_field('user')
+    cache_name = user_field.related.get_cache_name()
+    for profile in models.NewsroomProfile.objects.filter(
+            user__in=by_pk.keys()):
+        user_list = by_pk[profile.user_id]
+        setattr(profile, user_field.get_cache_name(), user_list[0])
+        for user in user_list:
+            setattr(user, cache_name, profile)
@@ -0,0 +1,31 @@
+"""
+The generation of the cached assignment listing rows.
+
+Each row is cached under a key which includes the current generation (see
+``newsroom_core.templatetags.newsroom_assignments.list_assignments``). The
+rows show the status, section and people of each assignment, so saving or
+deleting one of those moves on to a new generation rather than tracking down
+every row it appears in.
+"""
+import datetime
+from django.core.cache import cache
+
+GENERATION_KEY = 'newsroom-rows-generation'
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = invalidate()
+    return generation
+
+
+def invalidate(**kwargs):
+    """
+    Clear every cached row, by moving on to a new generation of row keys.
+    Returns the new generation. The keyword arguments are ignored so that
+    this can be connected directly to model signals.
+    """
+    generation = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')
+    cache.set(GENERATION_KEY, generation)
+    return generation
@@ -0,0 +1,87 @@
+"""
+A process level cache of the resolved fields for each assignment category.
+
+Category fields are stored as ``CategoryField`` rows with a concrete subclass
+for each field type, so resolving the fields of a category normally takes a
+query for the rows and another for each field's subclass. As the schema
+rarely changes, the resolved fields for every category are loaded at once and
+kept until a field is saved or deleted.
+
+When running more than one process, set ``NEWSROOM_SCHEMA_CACHE = True`` so
+that a generation number kept in Django's cache backend (i.e. memcached) lets
+every process know when its copy of the schema is stale.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = 'newsroom-schema-generation'
+
+_schema = {'generation': None, 'fields': None}
+
+
+def _shared():
+    return getattr(settings, 'NEWSROOM_SCHEMA_CACHE', False)
+
+
+def _get_generation():
+    if not _shared():
+        return None
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = int(time.time() * 1000)
+        cache.set(GENERATION_KEY, generation)
+    return generation
+
+
+def _load():
+    from newsroom_core import models
+    fields = {}
+    for field_model in (models.CategoryTextField, models.CategoryBigTextField,
+                        models.CategoryChoiceField):
+        for field in field_model.objects.all():
+            fields.setdefault(field.category_id, []).append(field)
+    for category_fields in fields.values():
+        category_fields.sort(key=lambda f: (not f.is_property, f.order))
+    return fields
+
+
+def get_all_fields():
+    """
+    Returns a dictionary mapping category ids to an ordered list of their
+    (concrete subclass) fields, properties first.
+    """
+    generation = _get_generation()
+    if _schema['fields'] is None or _schema['generation'] != generation:
+        _schema['fields'] = _load()
+        _schema['generation'] = generation
+    return _schema['fields']
+
+
+def get_fields(category_id):
+    """
+    Returns an ordered list of the fields for a category, properties first.
+    """
+    return get_all_fields().get(category_id, [])
+
+
+def get_sortable_properties():
+    """
+    Returns a list of all the sortable property fields (across every
+    category).
+    """
+    sortable = []
+    for fields in get_all_fields().values():
+        sortable.extend([f for f in fields if f.is_property and f.sortable])
+    sortable.sort(key=lambda f: f.pk)
+    return sortable
+
+
+def invalidate(**kwargs):
+    """
+    Clear the cached schema. The keyword arguments are ignored so that this
+    can be connected directly to model signals.
+    """
+    _schema['fields'] = None
+    if _shared():
+        cache.set(GENERATION_KEY, int(time.time() * 1000))
@@ -0,0 +1,141 @@
+"""
+Turn newsroom objects into plain dictionaries, ready to be dumped as JSON.
+
+Assignments are serialized a page at a time so that their related objects,
+involved people and dynamic field values are loaded with a constant number of
+queries rather than a few queries per assignment.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import simplejson
+from django.utils.encoding import force_unicode
+
+ASSIGNMENT_FIELDS = (
+    'id', 'title', 'slug', 'url', 'status', 'section', 'category',
+    'responsible', 'involved', 'pub_date', 'parent', 'confirmed',
+    'created_by', 'created_at', 'updated_on', 'properties', 'details',
+)
+
+
+def dumps(data):
+    return simplejson.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def assignment_queryset(queryset):
+    """
+    Select the related objects needed to serialize assignments.
+    """
+    return queryset.select_related('status', 'section', 'category',
+                                   'responsible', 'created_by', 'parent')
+
+
+def serialize_assignments(assignments, fields=ASSIGNMENT_FIELDS):
+    """
+    Returns a list of dictionaries for a list of assignments, containing only
+    the requested ``fields``.
+    """
+    from newsroom_core import models
+    assignments = list(assignments)
+    if not assignments:
+        return []
+    fields = set(fields)
+    involved = {}
+    if 'involved' in fields:
+        through = models.Assignment.involved.through
+        rows = through.objects.filter(
+            assignment__in=[a.pk for a in assignments]
+        ).values_list('assignment', 'user__username')
+        for assignment_id, username in rows:
+            involved.setdefault(assignment_id, []).append(username)
+    if 'properties' in fields or 'details' in fields:
+        models.Assignment.objects.load_values(assignments)
+
+    data = []
+    for assignment in assignments:
+        item = {}
+        for name in ASSIGNMENT_FIELDS:
+            if name not in fields:
+                continue
+            if name == 'id':
+                value = assignment.pk
+            elif name == 'url':
+                value = assignment.get_absolute_url()
+            elif name in ('status', 'section', 'category'):
+                value = getattr(assignment, name).slug
+            elif name in ('responsible', 'created_by'):
+                value = getattr(assignment, name).username
+            elif name == 'involved':
+                value = sorted(involved.get(assignment.pk, []))
+            elif name == 'parent':
+                value = assignment.parent_id
+            elif name in ('properties', 'details'):
+                value = dict([(field.name, force_unicode(field_value))
+                              for field, field_value
+                              in getattr(assignment, name)])
+            else:
+                value = getattr(assignment, name)
+            item[name] = value
+        data.append(item)
+    return data
+
+
+def serialize_comments(queryset):
+    return [_serialize_comment(comment)
+            for comment in queryset.select_related('created_by')]
+
+
+def serialize_status_changes(queryset):
+    return [_serialize_status_change(status_change)
+            for status_change in queryset.select_related('status', 'user')]
+
+
+def _serialize_comment(comment):
+    return {'id': comment.pk, 'assignment': comment.assignment_id,
+            'comment': comment.comment,
+            'file': comment.file and comment.file.url or None,
+            'created_by': comment.created_by.username,
+            'created_at': comment.created_at,
+            'updated_on': comment.updated_on}
+
+
+def _serialize_status_change(status_change):
+    return {'id': status_change.pk, 'assignment': status_change.assignment_id,
+            'status': status_change.status.slug,
+            'user': status_change.user.username,
+            'comment': status_change.comment, 'date': status_change.date}
+
+
+def serialize_status(status):
+    return {'id': status.pk, 'slug': status.slug, 'title': status.title,
+            'order': status.order, 'means_completed': status.means_completed}
+
+
+def serialize_section(section):
+    return {'id': section.pk, 'slug': section.slug, 'title': section.title}
+
+
+def serialize_categories(categories):
+    """
+    Returns a list of dictionaries for a list of categories, including the
+    fields of each category.
+    """
+    from newsroom_core import models
+    from newsroom_core.utils import schema
+    choices = {}
+    for field_id, option in models.CategoryChoiceFieldChoice.objects\
+                                .values_list('field', 'option'):
+        choices.setdefault(field_id, []).append(option)
+    data = []
+    for category in categories:
+        fields = []
+        for field in schema.get_fields(category.pk):
+            info = {'id': field.pk, 'name': field.name,
+                    'type': force_unicode(field._meta.verbose_name),
+                    'is_property': field.is_property,
+                    'required': field.required, 'sortable': field.sortable}
+            if isinstance(field, models.CategoryChoiceField):
+                info['choices'] = choices.get(field.pk, [])
+            fields.append(info)
+        data.append({'id': category.pk, 'slug': category.slug,
+                     'title': category.title,
+                     'top_category': category.top_category, 'fields': fields})
+    return data
@@ -2,6 +2,9 @@ import re
 
 from django.template.defaultfilters import slugify
 
+# The longest suffix (i.e. '-123456789') expected to be added to a slug.
+MAX_SUFFIX_LENGTH = 10
+
 
 def unique_slugify(instance, value, slug_field_name='slug', queryset=None,
                    slug_separator='-'):
@@ -13,6 +16,9 @@ def unique_slugify(instance, value, slug_field_name='slug', queryset=None,
 
     ``queryset`` usually doesn't need to be explicitly provided - it'll default
     to using the ``.all()`` queryset from the model's default manager.
+
+    All the existing slugs which could collide are fetched with a single query
+    and the next free suffix is picked from them.
     """
     slug_field = instance._meta.get_field(slug_field_name)
 
@@ -24,6 +30,12 @@ def unique_slugify(instance, value, slug_field_name='slug', queryset=None,
     if slug_len:
         slug = slug[:slug_len]
     slug = _slug_strip(slug, slug_separator)
+    if not slug:
+        # Nothing in the value made it into the slug (e.g. it was all
+        # punctuation), so fall back to the model's name.
+        slug = slugify(instance._meta.module_name)
+        if slug_len:
+            slug = _slug_strip(slug[:slug_len], slug_separator)
     original_slug = slug
 
     # Exclude the current instance. Create the queryset if we need to.
@@ -32,10 +44,20 @@ def unique_slugify(instance, value, slug_field_name='slug', queryset=None,
     if instance.pk:
         queryset = queryset.exclude(pk=instance.pk)
 
-    # Find a unique slug. If one matches, at '-2' to the end and try again
+    # Fetch all the slugs which could collide with one query. Suffixed slugs
+    # may have to be chopped down, so match on a shorter prefix if needed.
+    prefix = original_slug
+    if slug_len and len(prefix) + MAX_SUFFIX_LENGTH > slug_len:
+        prefix = _slug_strip(prefix[:slug_len-MAX_SUFFIX_LENGTH],
+                             slug_separator) or original_slug
+    lookup = '%s__startswith' % slug_field_name
+    taken = set(queryset.filter(**{lookup: prefix})
+                        .values_list(slug_field_name, flat=True))
+
+    # Find a unique slug. If one matches, add '-2' to the end and try again
     # (then '-3', etc).
     next = 2
-    while not slug or queryset.filter(**{slug_field_name: slug}):
+    while slug in taken:
         slug = original_slug
         end = '%s%s' % (slug_separator, next)
         if slug_len and len(slug) + len(end) > slug_len:
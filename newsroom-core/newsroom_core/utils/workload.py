@@ -0,0 +1,181 @@
+"""
+A summary of how many assignments and requests each user is involved in,
+kept in the ``Workload`` table with a row for each user, section and status.
+
+It is updated as the people involved in assignments change, as assignments
+change status, section or confirmation and as they are deleted, so a user's
+counts (the tab counts and "my assignments" link) are read from a handful of
+rows rather than counted through the involved people of every assignment.
+The editors' workload page comes from the same table.
+
+``rebuild`` (used by the ``newsroom_rebuild_workload`` management command)
+fills the table from scratch, for databases which were filled before it
+existed or have drifted.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+
+def _field(confirmed):
+    return confirmed and 'assignments' or 'requests'
+
+
+def update(user_ids, section_id, status_id, confirmed, change):
+    """
+    Add ``change`` (i.e. ``1`` or ``-1``) to the assignment or request count
+    of a list of users for a section and status.
+    """
+    from newsroom_core import models
+    field = _field(confirmed)
+    for user_id in user_ids:
+        rows = models.Workload.objects.filter(
+            user=user_id, section=section_id, status=status_id)
+        if rows.update(**{field: F(field) + change}) or change < 0:
+            continue
+        sid = transaction.savepoint()
+        try:
+            models.Workload.objects.create(
+                user_id=user_id, section_id=section_id, status_id=status_id,
+                **{field: change})
+        except IntegrityError:
+            # Someone else created the row in the meantime.
+            transaction.savepoint_rollback(sid)
+            rows.update(**{field: F(field) + change})
+        else:
+            transaction.savepoint_commit(sid)
+
+
+def get_counts(user):
+    """
+    Returns a dictionary containing the ``assignments`` (unfinished) and
+    ``requests`` counts for a user, read with a single query.
+    """
+    from newsroom_core import models
+    counts = {'assignments': 0, 'requests': 0}
+    rows = models.Workload.objects.filter(user=user).values_list(
+        'status__means_completed', 'assignments', 'requests')
+    for completed, assignments, requests in rows:
+        if not completed:
+            counts['assignments'] += assignments
+        counts['requests'] += requests
+    return counts
+
+
+def get_summary(section=None):
+    """
+    Returns the statuses (in order) and a list of ``(user, counts, requests)``
+    tuples, where ``counts`` is a list of the user's assignment count for each
+    status, for everyone with assignments or requests (in a section, if
+    given).
+    """
+    from django.contrib.auth.models import User
+    from newsroom_core import models
+    statuses = list(models.Status.objects.all())
+    rows = models.Workload.objects.all()
+    if section is not None:
+        rows = rows.filter(section=section)
+    users = {}
+    for user_id, status_id, assignments, requests in rows.values_list(
+            'user', 'status', 'assignments', 'requests'):
+        counts = users.setdefault(user_id, [{}, 0])
+        counts[0][status_id] = counts[0].get(status_id, 0) + assignments
+        counts[1] += requests
+    # The profiles are shown too, so load them in bulk.
+    user_field = models.NewsroomProfile._meta.get_field('user')
+    profiles = models.NewsroomProfile.objects.filter(user__in=users.keys())
+    profiles = dict([(profile.user_id, profile) for profile in profiles])
+    summary = []
+    for user in User.objects.filter(pk__in=users.keys())\
+                            .order_by('first_name', 'last_name'):
+        profile = profiles.get(user.pk)
+        if profile is not None:
+            setattr(user, user_field.related.get_cache_name(), profile)
+            setattr(profile, user_field.get_cache_name(), user)
+        by_status, requests = users[user.pk]
+        counts = [by_status.get(status.pk, 0) for status in statuses]
+        if sum(counts) or requests:
+            summary.append((user, counts, requests))
+    return statuses, summary
+
+
+def rebuild():
+    """
+    Fill the table from scratch. Returns the number of rows created.
+    """
+    from newsroom_core import models
+    through = models.Assignment.involved.through
+    rows = through.objects.order_by().values(
+        'user', 'assignment__section', 'assignment__status',
+        'assignment__confirmed').annotate(count=Count('pk'))
+    workload = {}
+    for row in rows:
+        key = (row['user'], row['assignment__section'],
+               row['assignment__status'])
+        counts = workload.setdefault(key, {'assignments': 0, 'requests': 0})
+        counts[_field(row['assignment__confirmed'])] += row['count']
+    models.Workload.objects.all().delete()
+    for (user_id, section_id, status_id), counts in workload.items():
+        models.Workload.objects.create(user_id=user_id, section_id=section_id,
+                                       status_id=status_id, **counts)
+    return len(workload)
+
+
+def assignment_saved(sender, instance, created, **kwargs):
+    if created:
+        # Nobody is involved yet.
+        return
+    changed = instance.changed_fields()
+    if not [f for f in ('section_id', 'status_id', 'confirmed')
+            if f in changed]:
+        return
+    user_ids = list(instance.involved.values_list('pk', flat=True))
+    original = instance._original
+    update(user_ids, original['section_id'], original['status_id'],
+           original['confirmed'], -1)
+    update(user_ids, instance.section_id, instance.status_id,
+           instance.confirmed, 1)
+
+
+def assignment_pre_delete(sender, instance, **kwargs):
+    # The involved people are deleted along with the assignment without
+    # sending ``m2m_changed``.
+    _update_assignment(instance, instance.involved.values_list('pk', flat=True),
+                       -1)
+
+
+def _update_assignment(assignment, user_ids, change):
+    # Use the values saved in the database.
+    original = assignment._original
+    update(list(user_ids), original['section_id'], original['status_id'],
+           original['confirmed'], change)
+
+
+def involved_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Update the table as people are added to or removed from assignments
+    (from either side of the relation). Removals are counted before they
+    happen, to only count the people who were actually involved.
+    """
+    from newsroom_core import models
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    change = action == 'post_add' and 1 or -1
+    pk_set = list(pk_set or [])
+    if not reverse:
+        user_ids = pk_set
+        if action != 'post_add':
+            user_ids = instance.involved.all()
+            if action == 'pre_remove':
+                user_ids = user_ids.filter(pk__in=pk_set)
+            user_ids = user_ids.values_list('pk', flat=True)
+        _update_assignment(instance, user_ids, change)
+        return
+    # The assignments of a user changed.
+    assignments = models.Assignment.objects.all()
+    if action != 'pre_clear':
+        assignments = assignments.filter(pk__in=pk_set)
+    if action != 'post_add':
+        assignments = assignments.filter(involved=instance)
+    for section_id, status_id, confirmed in assignments.values_list(
+            'section', 'status', 'confirmed'):
+        update([instance.pk], section_id, status_id, confirmed, change)
@@ -0,0 +1,212 @@
+"""
+A read-only JSON API for the newsroom.
+
+Assignments and requests are returned a page at a time, ordered by
+publication date (undated ones first) and then id. Each page includes a
+``next`` cursor to pass back as ``after`` to get the following page, which
+keeps every page a cheap indexed range query no matter how deep into the
+results it is.
+
+Query string arguments for the assignment and request lists:
+
+``after``
+    The cursor returned as ``next`` by the previous page.
+``limit``
+    The page size (``NEWSROOM_API_PAGE_SIZE`` by default, at most
+    ``NEWSROOM_API_MAX_PAGE_SIZE``).
+``fields``
+    A comma-separated list of the fields to include.
+``updated_since``
+    Only include items updated at or after this date/time
+    (``YYYY-MM-DDTHH:MM:SS``), for incremental syncing.
+``section``, ``category``, ``status``
+    Filter by slug.
+
+The change feed returns newline-delimited JSON: a line for each change since
+the ``since`` cursor, followed by a line with the ``cursor`` to ask for the
+next changes with (and whether ``more`` changes are waiting). It takes a
+``limit`` too (``NEWSROOM_API_CHANGES_PAGE_SIZE`` by default, at most
+``NEWSROOM_API_MAX_CHANGES_PAGE_SIZE``).
+"""
+import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from newsroom_core import changes as newsroom_changes
+from newsroom_core import models
+from newsroom_core.decorators import login_required
+from newsroom_core.utils import serialize
+
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+class ApiError(Exception):
+    pass
+
+
+def _json_response(data, status=200):
+    return HttpResponse(serialize.dumps(data), status=status,
+                        content_type='application/json; charset=utf-8')
+
+
+def _parse_datetime(value):
+    for format in DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, format)
+        except ValueError:
+            pass
+    raise ApiError('Invalid date/time: %s' % value)
+
+
+def _parse_cursor(value):
+    """
+    Cursors are ``<pub_date>:<pk>``, with an empty ``pub_date`` for undated
+    items.
+    """
+    try:
+        pub_date, pk = value.split(':')
+        pk = int(pk)
+        if pub_date:
+            pub_date = datetime.datetime.strptime(pub_date, '%Y-%m-%d').date()
+        else:
+            pub_date = None
+    except ValueError:
+        raise ApiError('Invalid cursor: %s' % value)
+    return pub_date, pk
+
+
+def _cursor(assignment):
+    pub_date = assignment.pub_date and assignment.pub_date.isoformat() or ''
+    return '%s:%s' % (pub_date, assignment.pk)
+
+
+def _get_fields(request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return serialize.ASSIGNMENT_FIELDS
+    fields = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in serialize.ASSIGNMENT_FIELDS]
+    if unknown:
+        raise ApiError('Unknown fields: %s' % ', '.join(unknown))
+    return fields
+
+
+def _get_limit(request):
+    default = getattr(settings, 'NEWSROOM_API_PAGE_SIZE', 50)
+    maximum = getattr(settings, 'NEWSROOM_API_MAX_PAGE_SIZE', 200)
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise ApiError('Invalid limit.')
+    return max(1, min(limit, maximum))
+
+
+def _page(queryset, after, limit):
+    """
+    Get a page of items (plus one, to tell if there is another page) after the
+    cursor position. Undated items come first, then the rest by date.
+    """
+    if after:
+        pub_date, pk = after
+    else:
+        pub_date, pk = None, None
+    items = []
+    if after is None or pub_date is None:
+        undated = queryset.filter(pub_date__isnull=True)
+        if pk is not None:
+            undated = undated.filter(pk__gt=pk)
+        items = list(undated.order_by('pk')[:limit + 1])
+    if len(items) <= limit:
+        dated = queryset.filter(pub_date__isnull=False)
+        if pub_date is not None:
+            dated = dated.filter(Q(pub_date__gt=pub_date) |
+                                 Q(pub_date=pub_date, pk__gt=pk))
+        items.extend(dated.order_by('pub_date', 'pk')[:limit + 1 - len(items)])
+    return items
+
+
+def _assignment_list(request, queryset):
+    try:
+        fields = _get_fields(request)
+        limit = _get_limit(request)
+        after = request.GET.get('after')
+        after = after and _parse_cursor(after) or None
+        updated_since = request.GET.get('updated_since')
+        if updated_since:
+            queryset = queryset.filter(
+                updated_on__gte=_parse_datetime(updated_since))
+    except ApiError as e:
+        return _json_response({'error': unicode(e)}, status=400)
+    for name in ('section', 'category', 'status'):
+        slug = request.GET.get(name)
+        if slug:
+            queryset = queryset.filter(**{'%s__slug' % name: slug})
+
+    items = _page(serialize.assignment_queryset(queryset), after, limit)
+    next = None
+    if len(items) > limit:
+        items = items[:limit]
+        next = _cursor(items[-1])
+    return _json_response({
+        'objects': serialize.serialize_assignments(items, fields),
+        'next': next,
+    })
+
+
+@login_required
+def assignments(request):
+    """
+    List assignments.
+    """
+    return _assignment_list(request, models.Assignment.objects.assignments())
+
+
+@login_required
+def requests(request):
+    """
+    List requests.
+    """
+    return _assignment_list(request, models.Assignment.objects.requests())
+
+
+@login_required
+def statuses(request):
+    return _json_response({'objects': [
+        serialize.serialize_status(status)
+        for status in models.Status.objects.all()
+    ]})
+
+
+@login_required
+def sections(request):
+    return _json_response({'objects': [
+        serialize.serialize_section(section)
+        for section in models.Section.objects.all()
+    ]})
+
+
+@login_required
+def categories(request):
+    return _json_response({'objects': serialize.serialize_categories(
+        models.Category.objects.all())})
+
+
+@login_required
+def changes(request):
+    """
+    Stream the changes to assignments, comments and status history.
+    """
+    maximum = getattr(settings, 'NEWSROOM_API_MAX_CHANGES_PAGE_SIZE', 2000)
+    try:
+        since = int(request.GET.get('since') or 0)
+        limit = int(request.GET.get('limit') or
+                    getattr(settings, 'NEWSROOM_API_CHANGES_PAGE_SIZE', 500))
+    except ValueError:
+        return _json_response({'error': 'Invalid since or limit.'},
+                              status=400)
+    data, cursor, more = newsroom_changes.get_changes(
+        since, max(1, min(limit, maximum)))
+    lines = [serialize.dumps(change) for change in data]
+    lines.append(serialize.dumps({'cursor': cursor, 'more': more}))
+    return HttpResponse(u''.join([u'%s\n' % line for line in lines]),
+                        content_type='application/x-ndjson; charset=utf-8')
@@ -1,6 +1,7 @@
 import datetime
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.db.models import Q
 from django.http import Http404, HttpResponseRedirect, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404
@@ -8,14 +9,17 @@ from django.views.generic.simple import direct_to_template
 from django.contrib.auth.models import User
 from newsroom_core import forms
 from newsroom_core import models
-from newsroom_core.decorators import login_required
+from newsroom_core.decorators import conditional_page, login_required
+from newsroom_core.managers import LISTING_RELATED
 from newsroom_core.utils.calendar import assignment_day_url
 from newsroom_core.utils.forms import form_kwargs
-from newsroom_core.utils.mail import send_mail_from_template
+from newsroom_core.utils import schema
+from newsroom_core.utils.mail import send_mass_mail_from_template
+from newsroom_core.utils.profile import load_profiles
 
 
 def _filter(request, extra_context):
-    assignments = models.Assignment.objects.assignments()
+    assignments = models.Assignment.objects.listing_assignments()
 
     section_slug = request.GET.get('section')
     if section_slug:
@@ -30,21 +34,30 @@ def _filter(request, extra_context):
 
 
 def _sort(request, assignments, extra_context):
-    if assignments:
+    """
+    Sort the assignments queryset in the database by up to two sort keys (as
+    chosen in the request or remembered in the session), setting the result
+    as ``sorted_assignments`` in the extra context.
+    """
+    has_assignments = bool(assignments[:1])
+    if has_assignments:
         # Calculate sort options
         sort_options = [
             ('title', 'Title'),
             ('created_at', 'Created Date'),
             ('status', 'Status'),
+            ('last_activity_at', 'Latest activity'),
+            ('comment_count', 'Comments'),
         ]
         sort_keys = {
             'title': SortKey('title'),
             'created_at': SortKey('created_at'),
-            'status': SortKey(['status', 'order']),
+            'status': SortKey('status__order'),
+            'last_activity_at': SortKey('last_activity_at'),
+            'comment_count': SortKey('comment_count'),
         }
         #Add in sortable properties, some of which may be numeric
-        for field in models.CategoryField.objects.filter(is_property=True)\
-                                                 .exclude(sortable=0):
+        for field in schema.get_sortable_properties():
             sort_options.append((str(field.pk), field.name))
             sort_keys[str(field.pk)] = PropertySortKey(field)
         extra_context['sort_options'] = sort_options
@@ -60,91 +73,199 @@ def _sort(request, assignments, extra_context):
             del request.session[key]
         except KeyError:
             pass
-    if assignments and not default_sort:
-        sorted_assignments = list(assignments)
-        sort1 = (request.GET.get('sort1',
-                                 request.session.get('newsroom-sort1')))
-        sort2 = (request.GET.get('sort2',
-                                 request.session.get('newsroom-sort2')))
-        if sort2 and sort2 in sort_keys:
-            if 'sort2' in request.GET:
-                reverse = bool(request.GET.get('sort2_reverse'))
-                request.session['newsroom-sort2'] = sort2
-                request.session['newsroom-sort2-reverse'] = reverse
-            else:
-                reverse = bool(request.session.get('newsroom-sort2-reverse'))
-            key = sort_keys[sort2]
-            sorted_assignments.sort(key=key, reverse=reverse)
-            extra_context['sort2'] = sort2
-            extra_context['sort2_reverse'] = reverse
-        if sort1 and sort1 in sort_keys:
-            if 'sort1' in request.GET:
-                reverse = bool(request.GET.get('sort1_reverse'))
-                request.session['newsroom-sort1'] = sort1
-                request.session['newsroom-sort1-reverse'] = reverse
+    if has_assignments and not default_sort:
+        sorted_assignments = assignments
+        order_by = []
+        for name in ('sort1', 'sort2'):
+            sort = request.GET.get(name,
+                                   request.session.get('newsroom-%s' % name))
+            if not sort or sort not in sort_keys:
+                continue
+            if name in request.GET:
+                reverse = bool(request.GET.get('%s_reverse' % name))
+                request.session['newsroom-%s' % name] = sort
+                request.session['newsroom-%s-reverse' % name] = reverse
             else:
-                reverse = bool(request.session.get('newsroom-sort1-reverse'))
-            key = sort_keys[sort1]
-            sorted_assignments.sort(key=key, reverse=reverse)
-            extra_context['sort1'] = sort1
-            extra_context['sort1_reverse'] = reverse
+                reverse = bool(request.session.get('newsroom-%s-reverse' %
+                                                   name))
+            key = sort_keys[sort]
+            sorted_assignments, order = key.apply(sorted_assignments,
+                                                  'newsroom_%s' % name)
+            order_by.append(reverse and '-%s' % order or order)
+            extra_context[name] = sort
+            extra_context['%s_reverse' % name] = reverse
+        if order_by:
+            # Fall back to the original ordering for equal sort values.
+            order_by.extend(assignments.query.order_by or
+                            models.Assignment._meta.ordering)
+            sorted_assignments = sorted_assignments.order_by(*order_by)
         extra_context['sorted_assignments'] = sorted_assignments
         return
     extra_context['sorted_assignments'] = assignments
 
 
+def _load_rows(assignments, extra_context):
+    """
+    Returns a list of the assignments shown by ``{% list_assignments %}`` on a
+    page, with the people shown in their rows loaded in bulk. The compiled and
+    profile pages don't show people in the rows, so nothing more is loaded
+    for them.
+    """
+    assignments = list(assignments)
+    if not (extra_context.get('compiled') or 'for_user' in extra_context):
+        models.Assignment.objects.load_related(assignments)
+    return assignments
+
+
+def load_detail(assignment, extra_context):
+    """
+    Set the ``comments`` and status ``history`` of an assignment in the extra
+    context, loading the people shown with them and the assignment in bulk.
+    """
+    comments = list(assignment.comments.select_related('created_by'))
+    history = list(assignment.statushistory_set.select_related('status',
+                                                               'user'))
+    models.Assignment.objects.load_related([assignment])
+    load_profiles([comment.created_by for comment in comments] +
+                  [change.user for change in history])
+    extra_context['comments'] = comments
+    extra_context['history'] = history
+
+
 def _get_related(assignment):
-    if assignment.parent:
-        related_requests = models.Assignment.objects.requests()\
-            .filter(Q(pk=assignment.parent.pk)|Q(parent=assignment.parent))\
-            .exclude(pk=assignment.pk).order_by('parent', 'title')
-        related_assignments = models.Assignment.objects.assignments()\
-            .filter(Q(pk=assignment.parent.pk)|Q(parent=assignment.parent))\
-            .exclude(pk=assignment.pk).order_by('parent', 'title')
-    else:
-        related_requests = assignment.children.requests().order_by('title')
-        related_assignments = assignment.children.assignments()\
-                                                        .order_by('title')
-    return related_requests, related_assignments
+    return _get_related_families([assignment])[assignment.pk]
 
 
-class SortKey:
-    def __init__(self, attr, numeric=False):
-        self.attr = attr
-        self.numeric = numeric
+def _get_related_families(assignments):
+    """
+    Returns a dictionary mapping the id of each of the assignments to a tuple
+    of its related requests and related assignments, loading the families of
+    every assignment with a single query.
+
+    The relations of a top-level assignment are its children. For a child,
+    they are its parent and the other children of its parent. Relations which
+    are among the given assignments are returned as those same objects, so
+    anything already loaded for them is shared.
+    """
+    roots = set()
+    by_pk = {}
+    for assignment in assignments:
+        roots.add(assignment.parent_id or assignment.pk)
+        by_pk[assignment.pk] = assignment
+    families = dict([(pk, []) for pk in roots])
+    if roots:
+        members = models.Assignment.objects.select_related(*LISTING_RELATED)\
+                    .filter(Q(pk__in=roots) | Q(parent__in=roots))
+        for member in members:
+            member = by_pk.get(member.pk, member)
+            families[member.parent_id or member.pk].append(member)
+    related = {}
+    for assignment in assignments:
+        if assignment.parent_id:
+            family = [a for a in families[assignment.parent_id]
+                      if a.pk != assignment.pk]
+            # Order the parent first.
+            family.sort(key=lambda a: (a.parent_id is not None, a.title))
+        else:
+            family = [a for a in families[assignment.pk] if a.parent_id]
+            family.sort(key=lambda a: a.title)
+        related[assignment.pk] = ([a for a in family if not a.confirmed],
+                                  [a for a in family if a.confirmed])
+    return related
 
-    def __call__(self, obj):
-        value = self.get_value(obj)
-        if self.numeric:
-            try:
-                value = float(value)
-            except (TypeError, ValueError):
-                value = None
-        return value
 
-    def get_value(self, obj):
-        if not isinstance(self.attr, (list, tuple)):
-            self.attr = [self.attr]
-        value = obj
-        for attr in self.attr:
-            value = getattr(value, attr)
-        return value
+class SortKey:
+    """
+    Sorts assignments by a model field (or a related field lookup).
+    """
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def apply(self, queryset, alias):
+        """
+        Returns a tuple of the (possibly altered) queryset and the name to pass
+        to ``order_by`` to sort by this key.
+        """
+        return queryset, self.lookup
 
 
 class PropertySortKey(SortKey):
+    """
+    Sorts assignments by the value of a category property. Properties are
+    matched by name so that similar properties of different categories sort
+    together.
+
+    The value is selected with a correlated subquery so the database can do
+    the sorting.
+    """
     def __init__(self, field):
         self.field = field
         self.numeric = field.sortable == 2
 
-    def get_value(self, obj):
-        properties = dict([(f.categoryfield_ptr.name, unicode(v)) for f, v in
-                           obj.properties])
-        p = properties.get(self.field.name)
-        if p:
-            return unicode(p)
+    def apply(self, queryset, alias):
+        sql, params = self.get_sql()
+        queryset = queryset.extra(select={alias: sql}, select_params=params)
+        return queryset, alias
+
+    def get_sql(self):
+        qn = connection.ops.quote_name
+        value_models = []
+        for fields in schema.get_all_fields().values():
+            for field in fields:
+                value_model = forms.get_value_model(field)
+                if (field.is_property and field.sortable and
+                        field.name == self.field.name and
+                        value_model not in value_models):
+                    value_models.append(value_model)
+        bits = []
+        params = []
+        for value_model in value_models:
+            value_field = value_model._meta.get_field('value')
+            tables = {
+                'values': qn(value_model._meta.db_table),
+                'fields': qn(models.CategoryField._meta.db_table),
+                'assignments': qn(models.Assignment._meta.db_table),
+            }
+            if value_field.rel:
+                tables['choices'] = qn(value_field.rel.to._meta.db_table)
+                sql = ('SELECT MAX(c.%s) FROM %%(values)s v '
+                       'INNER JOIN %%(choices)s c ON c.id = v.value_id '
+                       % qn('option'))
+            else:
+                sql = 'SELECT MAX(v.value) FROM %(values)s v '
+            sql += ('INNER JOIN %(fields)s f ON f.id = v.field_id '
+                    'WHERE v.assignment_id = %(assignments)s.id AND '
+                    'f.name = %%s')
+            bits.append('(%s)' % (sql % tables))
+            params.append(self.field.name)
+        if not bits:
+            return 'NULL', []
+        if len(bits) == 1:
+            sql = bits[0]
+        else:
+            sql = 'COALESCE(%s)' % ', '.join(bits)
+        if self.numeric:
+            sql, params = _numeric_sql(sql, params)
+        return sql, params
+
+
+def _numeric_sql(sql, params):
+    """
+    Wrap an SQL expression so that it is cast to a number (non-numeric values
+    sort as NULL where the database backend allows for it).
+    """
+    engine = connection.settings_dict['ENGINE'].split('.')[-1]
+    if engine.startswith('postgresql'):
+        sql = ("CASE WHEN %s ~ '^ *-?[0-9]+([.][0-9]+)? *$' "
+               "THEN CAST(%s AS double precision) END" % (sql, sql))
+        return sql, params * 2
+    if engine == 'mysql':
+        return 'CAST(%s AS DECIMAL(30, 10))' % sql, params
+    return 'CAST(%s AS REAL)' % sql, params
 
 
 @login_required
+@conditional_page
 def listing(request):
     """
     Show assignments for the upcoming days. Can be filtered by section, status
@@ -162,6 +283,7 @@ def listing(request):
 
 
 @login_required
+@conditional_page
 def listing_day(request, year, month, day):
     """
     Show all assignments for a day.
@@ -184,11 +306,13 @@ def listing_day(request, year, month, day):
     c['assignments'] = assignments
 
     _sort(request, assignments, c)
+    c['sorted_assignments'] = _load_rows(c['sorted_assignments'], c)
 
     return direct_to_template(request, 'newsroom/assignments_day.html', c)
 
 
 @login_required
+@conditional_page
 def compiled(request, year, month, day):
     """
     Show all assignments for a day in a compiled format.
@@ -200,10 +324,16 @@ def compiled(request, year, month, day):
 
     c = {'day': day, 'compiled': True}
     assignments = _filter(request, c)
-    assignments = list(assignments.filter(pub_date=day))
+    assignments = assignments.filter(pub_date=day)
+    # Load everything shown for the day at once: the values and people of
+    # the assignments here, and the related groups (with one more query)
+    # below. The rows of the related groups don't show people.
+    assignments = models.Assignment.objects.load_values(assignments)
+    models.Assignment.objects.load_related(assignments)
 
+    related = _get_related_families(assignments)
     for assignment in assignments:
-        r, a = _get_related(assignment)
+        r, a = related[assignment.pk]
         assignment.related_requests, assignment.related_assignments = r, a
 
     c['assignments'] = assignments
@@ -217,7 +347,8 @@ def assignments_involved(request, username):
     Show all assignments which a user is involved in.
     """
     user = get_object_or_404(User, username=username)
-    assignments = models.Assignment.objects.assignments().filter(involved=user)
+    assignments = models.Assignment.objects.listing_assignments()\
+                                           .filter(involved=user)
     assignments = assignments.filter(
         Q(pub_date__gte=datetime.date.today())|Q(status__means_completed=False)
     )
@@ -232,6 +363,10 @@ def assignments_involved(request, username):
     }
 
     _sort(request, assignments, c)
+    # Fetch the assignments once, whether they are listed sorted or grouped
+    # by day.
+    c['sorted_assignments'] = _load_rows(c['sorted_assignments'], c)
+    c['assignments'] = c['sorted_assignments']
 
     return direct_to_template(request, 'newsroom/assignments_profile.html', c)
 
@@ -260,12 +395,13 @@ def add_assignment(request, slug):
         form.save_m2m()
         properties_form.instance = obj
         details_form.instance = obj
-        properties_form.save()
+        # Re-index the new assignment once, with all of its values.
+        properties_form.save(reindex=False)
         details_form.save()
         # Send emails
-        for user in obj.involved.exclude(pk=request.user.pk):
-            c = {'assignment': obj, 'user': user}
-            send_mail_from_template(user.email, 'new_assignment', c)
+        recipients = [(user.email, {'assignment': obj, 'user': user})
+                      for user in obj.involved.exclude(pk=request.user.pk)]
+        send_mass_mail_from_template('new_assignment', recipients)
         return HttpResponseRedirect(obj.get_absolute_url())
 
     c = {
@@ -279,12 +415,15 @@ def add_assignment(request, slug):
 
 
 @login_required
+@conditional_page
 def assignment_detail(request, slug, child_id=None, is_request=False):
+    related = LISTING_RELATED + ('updated_by',)
     assignments = models.Assignment.objects.assignments()\
                                            .filter(parent__isnull=True)
-    assignment = get_object_or_404(assignments, slug=slug)
+    assignment = get_object_or_404(assignments.select_related(*related),
+                                   slug=slug)
     if child_id:
-        children = assignment.children.all()
+        children = assignment.children.select_related(*related)
         assignment = get_object_or_404(children, pk=child_id)
 
     is_request = not assignment.confirmed
@@ -302,6 +441,8 @@ def assignment_detail(request, slug, child_id=None, is_request=False):
 
     c['status_form'] = forms.StatusForm()
 
+    load_detail(assignment, c)
+
     related_requests, related_assignments = _get_related(assignment)
     c['related_requests'] = related_requests
     c['related_assignments'] = related_assignments
@@ -341,12 +482,14 @@ def edit_assignment(request, slug, child_id=None, is_request=False):
                                         details_form.is_valid()):
         obj = form.save(commit=False)
         obj.updated_by = request.user
-        obj.save()
-        form.save_m2m()
+        # Save the values first, so that saving the assignment re-indexes it
+        # (once) with them.
         properties_form.instance = obj
         details_form.instance = obj
-        properties_form.save()
-        details_form.save()
+        properties_form.save(reindex=False)
+        details_form.save(reindex=False)
+        obj.save()
+        form.save_m2m()
         return HttpResponseRedirect(obj.get_absolute_url())
 
     c = {
@@ -7,9 +7,11 @@ from django.shortcuts import get_object_or_404
 from django.views.generic.simple import direct_to_template
 from newsroom_core import models
 from newsroom_core import forms
-from newsroom_core.decorators import login_required
+from newsroom_core.decorators import editor_required, login_required
+from newsroom_core.utils.counts import get_user_counts
 from newsroom_core.utils.forms import form_kwargs
 from newsroom_core.utils.profile import get_profile
+from newsroom_core.utils import workload as newsroom_workload
 
 
 SHOW_ASSIGNMENTS = 3
@@ -42,10 +44,16 @@ def detail(request, username):
     profile = get_object_or_404(models.NewsroomProfile, user__username=username)
     q_active = (Q(pub_date__gte=datetime.date.today())|
                 Q(status__means_completed=False))
-    assignments = models.Assignment.objects.assignments()
+    assignments = models.Assignment.objects.listing_assignments()
     assignments = assignments.filter(involved=profile.user).filter(q_active)
-    requests = models.Assignment.objects.requests()
+    requests = models.Assignment.objects.listing_requests()
     requests = requests.filter(involved=profile.user).filter(q_active)
+    # Fetch one more assignment than is shown to tell if there are more.
+    assignments = list(assignments[:SHOW_ASSIGNMENTS + 1])
+    requests = list(requests)
+    # Load the people shown in both lists at once.
+    models.Assignment.objects.load_related(
+        assignments[:SHOW_ASSIGNMENTS] + requests)
     c = {
         'profile': profile,
         'assignments': assignments[:SHOW_ASSIGNMENTS],
@@ -54,12 +62,32 @@ def detail(request, username):
         # {% get_assignments %} tag.
         'current_section': 'x',
     }
-    count = assignments.count()
-    if count > SHOW_ASSIGNMENTS:
-        c['assignments_count'] = count
+    if len(assignments) > SHOW_ASSIGNMENTS:
+        c['more_assignments'] = True
+        c['open_count'] = get_user_counts(profile.user)['assignments']
     return direct_to_template(request, 'newsroom/person.html', c)
 
 
+@editor_required
+def workload(request):
+    """
+    Show how many assignments (in each status) and requests everyone is
+    involved in. Can be filtered by section.
+    """
+    c = {'sections': models.Section.objects.all()}
+    section = None
+    section_slug = request.GET.get('section')
+    if section_slug:
+        try:
+            section = models.Section.objects.get(slug=section_slug)
+        except models.Section.DoesNotExist:
+            pass
+        else:
+            c['current_section'] = section
+    c['statuses'], c['workload'] = newsroom_workload.get_summary(section)
+    return direct_to_template(request, 'newsroom/workload.html', c)
+
+
 @login_required
 def edit_profile(request, username=None):
     c = {}
@@ -75,6 +103,7 @@ def edit_profile(request, username=None):
         del form.fields['is_editor']
     if username != request.user.username:
         del form.fields['email_notifications']
+        del form.fields['email_digest']
         del form.fields['my_assignments_default']
         del form.fields['my_section_default']
         valid = form.is_valid() and user_form.is_valid()
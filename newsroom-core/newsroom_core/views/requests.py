@@ -6,11 +6,14 @@ from django.utils.safestring import mark_safe
 from django.views.generic.simple import direct_to_template
 from newsroom_core import forms
 from newsroom_core import models
-from newsroom_core.decorators import login_required, editor_required
+from newsroom_core.decorators import conditional_page, login_required, \
+    editor_required
 from newsroom_core.utils.forms import form_kwargs
+from newsroom_core.views.assignments import load_detail
 
 
 @login_required
+@conditional_page
 def listing(request):
     """
     Show current requests. Can be filtered by section.
@@ -19,7 +22,7 @@ def listing(request):
         'sections': models.Section.objects.all(),
     }
 
-    requests = models.Assignment.objects.requests()
+    requests = models.Assignment.objects.listing_requests()
 
     section_slug = request.GET.get('section')
     if section_slug:
@@ -33,10 +36,15 @@ def listing(request):
 
     sort = request.GET.get('sort')
     if sort == 'activity':
-        requests = requests.order_by('-updated_on')
+        requests = requests.order_by('-last_activity_at', '-pk')
+        c['sorted_by'] = sort
+    elif sort == 'active':
+        requests = requests.order_by('-comment_count', '-child_request_count',
+                                     '-last_activity_at', '-pk')
         c['sorted_by'] = sort
 
-    c['requests'] = requests
+    requests = models.Assignment.objects.load_values(requests)
+    c['requests'] = models.Assignment.objects.load_related(requests)
     c['sub_categories'] = models.Category.objects.exclude(top_category=True)
 
     return direct_to_template(request, 'newsroom/requests.html', c)
@@ -114,7 +122,8 @@ def add_request_to_assignment(request, category_slug, assignment_slug):
         form.save_m2m()
         properties_form.instance = obj
         details_form.instance = obj
-        properties_form.save()
+        # Re-index the new request once, with all of its values.
+        properties_form.save(reindex=False)
         details_form.save()
         return HttpResponseRedirect(obj.get_absolute_url())
 
@@ -147,4 +156,5 @@ def accept(request, slug, child_id):
         return HttpResponseRedirect(assignment.get_absolute_url())
 
     c = {'assignment': assignment, 'accept_form': form}
+    load_detail(assignment, c)
     return direct_to_template(request, 'newsroom/accept_request.html', c)
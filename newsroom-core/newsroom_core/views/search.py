@@ -0,0 +1,34 @@
+from django.contrib.contenttypes.models import ContentType
+from django.views.generic.simple import direct_to_template
+from newsroom_core import search as newsroom_search
+from newsroom_core.decorators import login_required
+
+
+RESULTS = 50
+
+
+@login_required
+def search(request):
+    """
+    Search assignments, comments, ideas, pages and files. Results can be
+    limited to one type of object.
+    """
+    query = request.GET.get('q', '').strip()
+    types = []
+    for model in newsroom_search.get_registered_models():
+        content_type = ContentType.objects.get_for_model(model)
+        types.append((str(content_type.pk), model._meta.verbose_name_plural))
+    types.sort(key=lambda bits: bits[1])
+    c = {'query': query, 'types': types}
+
+    models = None
+    current_type = request.GET.get('type')
+    if current_type in dict(types):
+        content_type = ContentType.objects.get_for_id(int(current_type))
+        models = [content_type.model_class()]
+        c['current_type'] = current_type
+
+    if query:
+        c['results'] = newsroom_search.search(query, limit=RESULTS,
+                                              models=models)
+    return direct_to_template(request, 'newsroom/search.html', c)
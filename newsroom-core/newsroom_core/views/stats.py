@@ -0,0 +1,16 @@
+from django.views.generic.simple import direct_to_template
+from newsroom_core import instrumentation
+from newsroom_core.decorators import editor_required
+
+
+@editor_required
+def stats(request):
+    """
+    Show the query counts and timings recorded for each view by the
+    instrumentation middleware.
+    """
+    c = {
+        'enabled': instrumentation.enabled(),
+        'summary': instrumentation.get_summary(),
+    }
+    return direct_to_template(request, 'newsroom/stats.html', c)
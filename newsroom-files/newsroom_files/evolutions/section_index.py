@@ -0,0 +1,17 @@
+from django_evolution.mutations import *
+from django.db import models
+
+
+def unchanged_signature(app_label, project_sig):
+    # Indexes aren't part of the model signature.
+    pass
+
+
+# Files are listed by section, most recently updated first. The index is
+# created for new databases by sql/file.sql.
+MUTATIONS = [
+    SQLMutation('section_index', [
+        'CREATE INDEX newsroom_files_file_section_updated_on '
+        'ON newsroom_files_file (section_id, updated_on DESC)',
+    ], unchanged_signature),
+]
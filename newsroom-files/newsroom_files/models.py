@@ -1,5 +1,6 @@
 import os
 from django.db import models
+from newsroom_core import search
 from newsroom_core.models import BaseItem, Section
 
 
@@ -29,4 +30,14 @@ class File(BaseItem):
         return os.path.basename(self.file.name)
 
     class Meta:
-        ordering = ('-updated_on', 'file')
\ No newline at end of file
+        ordering = ('-updated_on', 'file')
+
+
+class FileIndex(search.SearchIndex):
+    def get_text(self, obj):
+        # Split the file name into words (i.e. "budget_2009.xls").
+        name = unicode(obj).replace('_', ' ')
+        return [(name, search.TITLE_WEIGHT), (obj.description, 1)]
+
+
+search.register(File, FileIndex)
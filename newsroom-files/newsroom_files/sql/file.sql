@@ -0,0 +1,2 @@
+-- Also added to existing databases by the section_index evolution.
+CREATE INDEX newsroom_files_file_section_updated_on ON newsroom_files_file (section_id, updated_on DESC);
@@ -0,0 +1,3 @@
+SEQUENCE = [
+    'section_index',
+]
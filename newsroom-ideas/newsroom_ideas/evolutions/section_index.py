@@ -0,0 +1,17 @@
+from django_evolution.mutations import *
+from django.db import models
+
+
+def unchanged_signature(app_label, project_sig):
+    # Indexes aren't part of the model signature.
+    pass
+
+
+# Ideas are listed by section, newest first. The index is created for new
+# databases by sql/idea.sql.
+MUTATIONS = [
+    SQLMutation('section_index', [
+        'CREATE INDEX newsroom_ideas_idea_section_created_at '
+        'ON newsroom_ideas_idea (section_id, created_at DESC)',
+    ], unchanged_signature),
+]
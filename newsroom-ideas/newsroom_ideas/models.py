@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils.text import truncate_words
+from newsroom_core import search
 from newsroom_core.models import BaseItem, Section
 
 
@@ -18,4 +20,27 @@ class Comment(BaseItem):
     file = models.FileField(upload_to='uploads/newsroom/ideas', blank=True)
 
     class Meta:
-        ordering = ('created_at',)
\ No newline at end of file
+        ordering = ('created_at',)
+
+
+class IdeaIndex(search.SearchIndex):
+    def get_title(self, obj):
+        return truncate_words(obj.idea, 10)
+
+    def get_text(self, obj):
+        return [(obj.idea, 1)]
+
+
+class CommentIndex(search.SearchIndex):
+    def get_title(self, obj):
+        return u'Reply to %s' % truncate_words(obj.idea.idea, 10)
+
+    def get_text(self, obj):
+        return [(obj.comment, 1)]
+
+    def get_url(self, obj):
+        return obj.idea.get_absolute_url()
+
+
+search.register(Idea, IdeaIndex)
+search.register(Comment, CommentIndex)
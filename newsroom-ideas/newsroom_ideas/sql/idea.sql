@@ -0,0 +1,2 @@
+-- Also added to existing databases by the section_index evolution.
+CREATE INDEX newsroom_ideas_idea_section_created_at ON newsroom_ideas_idea (section_id, created_at DESC);
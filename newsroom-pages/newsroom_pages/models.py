@@ -1,4 +1,5 @@
 from django.db import models
+from newsroom_core import search
 from newsroom_core.models import BaseItem #, Section
 
 
@@ -19,3 +20,12 @@ class Page(BaseItem):
 
     class Meta:
         ordering = ('-pinned', '-created_at',)
+
+
+class PageIndex(search.SearchIndex):
+    def get_text(self, obj):
+        return [(obj.title, search.TITLE_WEIGHT), (obj.summary, 2),
+                (obj.content, 1)]
+
+
+search.register(Page, PageIndex)